@@ -4,15 +4,59 @@ See README.md for instructions
 """
 
 from __future__ import annotations
+import asyncio
+import atexit
+import ctypes
+import html
 import json
+import mmap
 import os
+import re
+import shlex
+import shutil
 import subprocess
+import sys
+import threading
+import time
+import types
 import datetime
+import hashlib
+import heapq
+import math
+import traceback
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import cairocffi
+
+try:
+    from dbus_fast import BusType, Message, MessageType
+    from dbus_fast.aio import MessageBus
+except ImportError:
+    MessageBus = None
+from libqtile.backend.base.drawer import TextLayout
+from libqtile.command import interface
+from libqtile.command.base import expose_command
 from libqtile.core.manager import Qtile
+from libqtile.images import Img
+import libqtile
 from libqtile import bar, layout, widget, hook
-from libqtile.config import Key, Group, Screen, Match, Click, Drag, ScratchPad, DropDown
-from libqtile.lazy import lazy
+from libqtile.popup import Popup
+from libqtile.widget import base
+from libqtile.config import (
+    Key,
+    Group,
+    Screen,
+    Match,
+    Rule,
+    Click,
+    Drag,
+    ScratchPad,
+    DropDown,
+)
+from libqtile.lazy import LazyCall, lazy
+from libqtile.log_utils import logger
 
 colors = {
     "burgandy": "#b84d57",
@@ -34,6 +78,483 @@ images = {
 mod = "mod4"  # super key is modifier
 terminal = "alacritty"
 
+# Objects that own fds, threads or child processes are kept in a module that
+# outlives `reload_config`, so a reload reuses them instead of leaking them.
+_state = sys.modules.setdefault(
+    "qtile_config_state", types.ModuleType("qtile_config_state")
+)
+
+
+def persistent(name, factory):
+    """Returns the process-wide object `name`, created with `factory` on first use"""
+    obj = getattr(_state, name, None)
+    if obj is None:
+        obj = factory()
+        setattr(_state, name, obj)
+    return obj
+
+
+class SubprocessAccounting:
+    """Records every subprocess the config launches
+
+    Runs are grouped per (caller, program) in a bounded LRU holding counts,
+    failures, timeouts and a log2 histogram of wall times. Launch times are
+    kept in a ring for the forks/minute readout.
+    """
+
+    # Bucket i counts runs that took less than 2**i ms; the last one is open-ended
+    buckets = 16
+
+    def __init__(self, max_entries=128, max_launches=4096):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.launches = deque(maxlen=max_launches)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _program(args):
+        if isinstance(args, str):
+            args = shlex.split(args) or [""]
+        return os.path.basename(str(args[0]))
+
+    def record(self, caller, args, wall=None, returncode=None, timed_out=False):
+        """Adds one launch; `wall` is None for detached processes"""
+        key = (caller, self._program(args))
+        with self.lock:
+            self.launches.append(time.monotonic())
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                entry = {
+                    "count": 0,
+                    "failures": 0,
+                    "timeouts": 0,
+                    "total_s": 0.0,
+                    "max_s": 0.0,
+                    "histogram": array("I", bytes(4 * self.buckets)),
+                }
+                if len(self.entries) >= self.max_entries:
+                    self.entries.popitem(last=False)
+            self.entries[key] = entry
+            entry["count"] += 1
+            entry["last_args"] = str(args)[:200]
+            entry["failures"] += bool(returncode)
+            entry["timeouts"] += timed_out
+            if wall is not None:
+                entry["total_s"] += wall
+                entry["max_s"] = max(entry["max_s"], wall)
+                bucket = min(int(wall * 1000).bit_length(), self.buckets - 1)
+                entry["histogram"][bucket] += 1
+
+    def _timed(self, func, args, kwargs):
+        caller = sys._getframe(2).f_code.co_name
+        start = time.monotonic()
+        try:
+            result = func(args, **kwargs)
+        except subprocess.TimeoutExpired:
+            self.record(caller, args, time.monotonic() - start, timed_out=True)
+            raise
+        except subprocess.CalledProcessError as e:
+            self.record(caller, args, time.monotonic() - start, e.returncode)
+            raise
+        except OSError:
+            self.record(caller, args, time.monotonic() - start, returncode=127)
+            raise
+        returncode = getattr(
+            result, "returncode", result if isinstance(result, int) else 0
+        )
+        self.record(caller, args, time.monotonic() - start, returncode)
+        return result
+
+    def run(self, args, **kwargs):
+        return self._timed(subprocess.run, args, kwargs)
+
+    def call(self, args, **kwargs):
+        return self._timed(subprocess.call, args, kwargs)
+
+    def check_output(self, args, **kwargs):
+        return self._timed(subprocess.check_output, args, kwargs)
+
+    def Popen(self, args, **kwargs):
+        process = subprocess.Popen(args, **kwargs)
+        self.record(sys._getframe(1).f_code.co_name, args)
+        return process
+
+    def forks_per_minute(self):
+        cutoff = time.monotonic() - 60
+        with self.lock:
+            return sum(1 for launched in self.launches if launched >= cutoff)
+
+    def report(self, top=20):
+        """Returns the `top` entries by total wall time"""
+        with self.lock:
+            entries = sorted(
+                self.entries.items(), key=lambda item: item[1]["total_s"], reverse=True
+            )[:top]
+            return [
+                {
+                    "caller": caller,
+                    "program": program,
+                    **entry,
+                    "histogram": {
+                        f"<{2**i}ms" if i < self.buckets - 1 else "slower": count
+                        for i, count in enumerate(entry["histogram"])
+                        if count
+                    },
+                }
+                for (caller, program), entry in entries
+            ]
+
+    def reset(self):
+        with self.lock:
+            self.entries.clear()
+            self.launches.clear()
+
+
+subprocesses = persistent("subprocesses", SubprocessAccounting)
+
+
+def spawn(cmd, shell=False):
+    """Like lazy.spawn, but the launch is counted in the subprocess accounting"""
+
+    def _spawn(qtile):
+        qtile.spawn(cmd, shell=shell)
+        subprocesses.record("lazy.spawn", cmd)
+
+    return lazy.function(_spawn)
+
+
+class StallDetector:
+    """Watchdog for blocking work on qtile's event loop
+
+    The loop bumps a heartbeat every `interval` seconds. A watchdog thread
+    that sees the heartbeat lag by more than `threshold` samples the loop
+    thread's stack; once the loop comes back, the stall is recorded with its
+    duration. The `keep` worst stalls are retained along with the most
+    recent ones. It only runs with QTILE_DEBUG_BAR=1, like the debug readout,
+    so a normal session doesn't pay for the wakeups.
+    """
+
+    def __init__(self, threshold=0.25, interval=0.1, keep=20):
+        self.threshold = threshold
+        self.interval = interval
+        self.keep = keep
+        self.worst = []  # min-heap of (duration, sequence, stall)
+        self.recent = deque(maxlen=keep)
+        self.sequence = 0
+        self.loop = None
+        self.loop_thread = None
+        self.heartbeat = time.monotonic()
+        self._sampled = None
+        self._stack = None
+        self.lock = threading.Lock()
+
+    def start(self, loop):
+        """Starts watching `loop`; must be called from the loop's thread"""
+        if self.loop is not None:
+            return
+        self.loop = loop
+        self.loop_thread = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        loop.call_later(self.interval, self._beat)
+        threading.Thread(target=self._watch, name="stall-detector", daemon=True).start()
+
+    def _beat(self):
+        now = time.monotonic()
+        late = now - self.heartbeat - self.interval
+        if late >= self.threshold:
+            stack = self._stack if self._sampled == self.heartbeat else None
+            self._record(late, stack)
+        self.heartbeat = now
+        self.loop.call_later(self.interval, self._beat)
+
+    def _watch(self):
+        while True:
+            time.sleep(self.threshold / 2)
+            beat = self.heartbeat
+            if (
+                beat == self._sampled
+                or time.monotonic() - beat < self.interval + self.threshold
+            ):
+                continue
+            frame = sys._current_frames().get(self.loop_thread)
+            if frame is None:
+                continue
+            self._stack = [
+                f"{entry.filename}:{entry.lineno} in {entry.name}"
+                for entry in traceback.extract_stack(frame)[-25:]
+            ]
+            self._sampled = beat
+
+    def _record(self, duration, stack):
+        stall = {
+            "at": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            "duration_s": round(duration, 3),
+            "stack": stack or ["<loop recovered before it could be sampled>"],
+        }
+        with self.lock:
+            self.sequence += 1
+            self.recent.append(stall)
+            entry = (duration, self.sequence, stall)
+            if len(self.worst) < self.keep:
+                heapq.heappush(self.worst, entry)
+            else:
+                heapq.heappushpop(self.worst, entry)
+
+    def report(self):
+        with self.lock:
+            return {
+                "running": self.loop is not None,
+                "threshold_s": self.threshold,
+                "worst": [stall for _, _, stall in sorted(self.worst, reverse=True)],
+                "recent": list(self.recent),
+            }
+
+    def reset(self):
+        with self.lock:
+            self.worst.clear()
+            self.recent.clear()
+
+
+stall_detector = persistent("stall_detector", StallDetector)
+
+
+class MetricsPublisher:
+    """Shares the config's latest metrics with scripts running outside qtile
+
+    Both read paths live in $XDG_RUNTIME_DIR/qtile:
+
+    metrics.snapshot is a fixed-size, mmap'd text file of `key=value` lines
+    between a `seq=N` and an `end=N` line. A reader needs a single read and
+    retries when the two numbers differ or are odd (a write was in flight).
+
+    metrics.sock speaks length-prefixed frames: a 4-byte big-endian size,
+    then the payload. A request lists the wanted keys separated by spaces
+    (empty for all of them) and the reply is a JSON object.
+    """
+
+    size = 16384
+    header = len("seq=00000000000000000000\n")
+
+    def __init__(self):
+        self.directory = os.path.join(
+            os.environ.get("XDG_RUNTIME_DIR") or f"/tmp/qtile-{os.getuid()}", "qtile"
+        )
+        self.values = {}
+        self.sequence = 0
+        self.flush_pending = False
+        self.lock = threading.Lock()
+        self.loop = None
+        self.map = None
+
+    def start(self, loop):
+        """Creates the snapshot file and starts the socket server on `loop`"""
+        if self.loop is not None:
+            return
+        self.loop = loop
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        fd = os.open(
+            os.path.join(self.directory, "metrics.snapshot"),
+            os.O_RDWR | os.O_CREAT,
+            0o600,
+        )
+        try:
+            os.ftruncate(fd, self.size)
+            self.map = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+        socket_path = os.path.join(self.directory, "metrics.sock")
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        asyncio.ensure_future(asyncio.start_unix_server(self._serve, socket_path))
+        self._flush()
+
+    def update(self, **values):
+        """Publishes `values`; safe from any thread, bursts are written once"""
+        with self.lock:
+            self.values.update(values)
+            if self.flush_pending or self.loop is None:
+                return
+            self.flush_pending = True
+        self.loop.call_soon_threadsafe(self._flush)
+
+    def _flush(self):
+        with self.lock:
+            self.flush_pending = False
+            values = sorted(self.values.items())
+        body = "".join(
+            f"{key}={str(value).replace(chr(10), ' ')}\n" for key, value in values
+        )
+        sequence = self.sequence + 2
+        payload = f"{body}end={sequence:020d}\n".encode()
+        if self.header + len(payload) > self.size:
+            logger.warning(
+                "metrics snapshot is larger than %d bytes, not written", self.size
+            )
+            return
+        end = self.header + len(payload)
+        # An odd sequence in the header tells readers a write is in progress
+        self.map[: self.header] = f"seq={sequence - 1:020d}\n".encode()
+        self.map[self.header : end] = payload
+        self.map[end:] = bytes(self.size - end)
+        self.map[: self.header] = f"seq={sequence:020d}\n".encode()
+        self.sequence = sequence
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                size = int.from_bytes(await reader.readexactly(4), "big")
+                if size > 4096:
+                    break
+                keys = (await reader.readexactly(size)).decode(errors="replace").split()
+                with self.lock:
+                    if keys:
+                        reply = {key: self.values.get(key) for key in keys}
+                    else:
+                        reply = dict(self.values)
+                payload = json.dumps(reply).encode()
+                writer.write(len(payload).to_bytes(4, "big") + payload)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+metrics = persistent("metrics_publisher", MetricsPublisher)
+
+
+class BatchCommandServer:
+    """Runs batches of qtile commands for scripts over a unix socket
+
+    $XDG_RUNTIME_DIR/qtile/commands.sock takes one command per line in
+    `qtile cmd-obj` syntax (`-o widget brightness -f set_level -a 50`). A blank
+    line or EOF ends a batch. A batch runs in one go on the event loop, so no
+    other event is handled in between, and it stops at the first failing
+    command. The reply is one JSON line with an {"ok", "result"} entry per
+    command; a batch of more than `max_batch` commands is refused whole with a
+    single failed entry, and nothing in it runs. A connection can send any
+    number of batches; install/qtile-batch.sh is the client.
+    """
+
+    graph_objects = {"bar", "core", "group", "layout", "screen", "widget", "window"}
+    options = {
+        "-o": "o", "--object": "o",
+        "-f": "f", "--function": "f",
+        "-a": "a", "--args": "a",
+        "-k": "k", "--kwargs": "k",
+    }
+
+    def __init__(self, max_batch=256):
+        self.max_batch = max_batch
+        self.loop = None
+        self.batches = 0
+        self.commands = 0
+
+    def start(self, loop):
+        if self.loop is not None:
+            return
+        self.loop = loop
+        os.makedirs(metrics.directory, mode=0o700, exist_ok=True)
+        socket_path = os.path.join(metrics.directory, "commands.sock")
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        asyncio.ensure_future(asyncio.start_unix_server(self._serve, socket_path))
+
+    def parse(self, line):
+        """Turns a cmd-obj style line into the call tuple qtile's IPC server takes"""
+        path, name, args, kwargs = [], None, [], {}
+        option = None
+        for token in shlex.split(line):
+            if token in self.options:
+                option = self.options[token]
+            elif option == "o":
+                path.append(token)
+            elif option == "f" and name is None:
+                name = token
+            elif option == "a":
+                args.append(token)
+            elif option == "k":
+                key, _, value = token.partition("=")
+                kwargs[key] = value
+            else:
+                raise ValueError(f"unexpected {token!r}")
+        if name is None:
+            raise ValueError("no function given (-f)")
+        if path[:1] in (["cmd"], ["root"]):
+            path = path[1:]
+        selectors = []
+        while path:
+            obj = path.pop(0)
+            if obj not in self.graph_objects:
+                raise ValueError(f"unknown object {obj!r}")
+            selector = None
+            if path and path[0] not in self.graph_objects:
+                selector = path.pop(0)
+                if obj in ("layout", "screen", "window") and selector.isdigit():
+                    selector = int(selector)
+            selectors.append((obj, selector))
+        # lifted: string arguments are converted to the command's annotated types,
+        # like cmd-obj does
+        return (selectors, name, tuple(args), kwargs, True)
+
+    def run(self, lines):
+        results = []
+        failed = False
+        for line in lines:
+            if failed:
+                results.append({"ok": False, "skipped": True})
+                continue
+            try:
+                status, value = libqtile.qtile.server.call(self.parse(line))
+                ok = status == interface.SUCCESS
+            except Exception as e:
+                ok, value = False, str(e)
+            results.append({"ok": ok, "result": value})
+            failed = not ok
+        self.batches += 1
+        self.commands += len(lines)
+        return results
+
+    async def _serve(self, reader, writer):
+        batch = []
+        overflow = 0
+        try:
+            while True:
+                line = await reader.readline()
+                text = line.decode(errors="replace").strip()
+                if text:
+                    if text.startswith("#"):
+                        continue
+                    # Read an oversized batch to its end, but don't hold on to it
+                    if len(batch) < self.max_batch:
+                        batch.append(text)
+                    else:
+                        overflow += 1
+                    continue
+                if overflow:
+                    size = len(batch) + overflow
+                    limit = self.max_batch
+                    error = f"batch of {size} commands exceeds the limit of {limit}"
+                    results = [{"ok": False, "result": error}]
+                elif batch:
+                    results = self.run(batch)
+                else:
+                    results = None
+                if results is not None:
+                    writer.write(json.dumps(results, default=repr).encode() + b"\n")
+                    await writer.drain()
+                    batch = []
+                    overflow = 0
+                if not line:
+                    break
+        except (ValueError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+batch_commands = persistent("batch_commands", BatchCommandServer)
+
 
 def get_screenshot_filename():
     """Generate screenshot filename using pathlib"""
@@ -50,12 +571,12 @@ def multimedia_cmd(
     def execute(qtile=None):
         try:
             # Execute the main command
-            subprocess.run(command, shell=True, check=True, capture_output=True)
+            subprocesses.run(command, shell=True, check=True, capture_output=True)
 
             # Get current status if status command provided
             if get_status_cmd:
                 try:
-                    result = subprocess.run(
+                    result = subprocesses.run(
                         get_status_cmd,
                         shell=True,
                         capture_output=True,
@@ -77,7 +598,7 @@ def multimedia_cmd(
                 body = notification_body or "Action completed"
 
             # Show notification
-            subprocess.run(
+            subprocesses.run(
                 [
                     "notify-send",
                     "-t",
@@ -92,7 +613,7 @@ def multimedia_cmd(
 
         except Exception as e:
             # Show error notification
-            subprocess.run(
+            subprocesses.run(
                 [
                     "notify-send",
                     "-t",
@@ -183,6 +704,160 @@ def highlight_mouse_cursor(qtile: Qtile):
         time.sleep(delay_per_point)
 
 
+class BacklightDevice:
+    """A sysfs brightness file, kept open and accessed with pread/pwrite"""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(os.path.join(path, "max_brightness")) as f:
+            self.max = int(f.read())
+        brightness = os.path.join(path, "brightness")
+        try:
+            self.fd = os.open(brightness, os.O_RDWR | os.O_CLOEXEC)
+            self.writable = True
+        except PermissionError:
+            logger.warning(
+                "%s is read-only, run install/setup-brightness-permissions.sh",
+                brightness,
+            )
+            self.fd = os.open(brightness, os.O_RDONLY | os.O_CLOEXEC)
+            self.writable = False
+        self.raw = self.read()
+
+    def read(self):
+        return int(os.pread(self.fd, 32, 0))
+
+    def write(self, raw):
+        raw = max(0, min(self.max, raw))
+        if raw == self.raw or not self.writable:
+            return
+        try:
+            os.pwrite(self.fd, b"%d" % raw, 0)
+            self.raw = raw
+        except OSError:
+            logger.exception("failed to set %s brightness", self.name)
+
+
+class BrightnessController:
+    """Screen and keyboard backlight, written straight to sysfs
+
+    Screen changes ramp to the target on the event loop, one write per frame
+    and only when the raw value changes. Key repeats arriving mid-ramp just
+    move the target, so holding a key is one continuous ramp. The bar reads
+    the cached target instead of sysfs.
+    """
+
+    # Same preference as systemd-backlight: firmware interfaces over raw ones
+    backlight_types = ("firmware", "platform", "raw")
+
+    def __init__(self, step=5, min_level=1, ramp=0.15, fps=60):
+        self.step = step
+        self.min_level = min_level
+        self.ramp = ramp
+        self.frame_interval = 1 / fps
+        self.screen = self._open(self._screen_path())
+        self.keyboard = self._open(
+            next(iter(sorted(Path("/sys/class/leds").glob("*kbd_backlight"))), None)
+        )
+        self.level = self.target = self._percent() if self.screen else 0
+        self.ramp_from = self.level
+        self.ramp_start = 0.0
+        self.frame = None
+        self.listeners = set()
+
+    def _screen_path(self):
+        devices = []
+        for path in Path("/sys/class/backlight").glob("*"):
+            try:
+                kind = (path / "type").read_text().strip()
+            except OSError:
+                continue
+            if kind in self.backlight_types:
+                devices.append((self.backlight_types.index(kind), path.name, path))
+        return min(devices)[2] if devices else None
+
+    @staticmethod
+    def _open(path):
+        if path is None:
+            return None
+        try:
+            return BacklightDevice(str(path))
+        except (OSError, ValueError):
+            logger.exception("failed to open backlight %s", path)
+            return None
+
+    def _percent(self):
+        return self.screen.raw * 100 / self.screen.max
+
+    def adjust(self, delta):
+        self.set_level(self.target + delta)
+
+    def set_level(self, level):
+        if self.screen is None:
+            return
+        self.target = max(self.min_level, min(100, level))
+        self.ramp_from = self.level
+        self.ramp_start = asyncio.get_running_loop().time()
+        if self.frame is None:
+            self._frame()
+        self._notify()
+
+    def _frame(self):
+        loop = asyncio.get_running_loop()
+        t = min(1.0, (loop.time() - self.ramp_start) / self.ramp)
+        eased = 1 - (1 - t) ** 2  # ease-out
+        self.level = self.ramp_from + (self.target - self.ramp_from) * eased
+        self.screen.write(round(self.screen.max * self.level / 100))
+        if t < 1:
+            self.frame = loop.call_later(self.frame_interval, self._frame)
+        else:
+            self.frame = None
+
+    def adjust_keyboard(self, delta):
+        if self.keyboard is not None:
+            self.set_keyboard(self.keyboard.raw + delta)
+
+    def set_keyboard(self, level):
+        if self.keyboard is not None:
+            self.keyboard.write(int(level))
+            self._notify()
+
+    def sync(self):
+        """Picks up changes made outside qtile (firmware hotkeys, brightnessctl)"""
+        changed = False
+        for device in (self.screen, self.keyboard):
+            if device is None:
+                continue
+            raw = device.read()
+            changed |= raw != device.raw
+            device.raw = raw
+        if changed and self.frame is None and self.screen is not None:
+            self.level = self.target = self._percent()
+        if changed:
+            self._notify()
+
+    def _notify(self):
+        for listener in list(self.listeners):
+            listener.refresh()
+
+
+backlight = persistent("backlight", BrightnessController)
+
+
+def change_brightness(delta=0, keyboard=0):
+    """Lazy call that moves the screen by `delta` % or the keyboard by `keyboard` steps"""
+
+    @lazy.function
+    def _change(qtile):
+        if delta:
+            backlight.adjust(delta)
+        if keyboard:
+            backlight.adjust_keyboard(keyboard)
+
+    return _change
+
+
 # keymaps
 keys = [
     # A list of available commands that can be bound to keys can be found
@@ -225,7 +900,7 @@ keys = [
         lazy.layout.toggle_split(),
         desc="Toggle between split and unsplit sides of stack",
     ),
-    Key([mod], "Return", lazy.spawn(terminal), desc="Launch terminal"),
+    Key([mod], "Return", spawn(terminal), desc="Launch terminal"),
     # Toggle between different layouts as defined below
     Key([mod], "Tab", lazy.next_layout(), desc="Toggle between layouts"),
     Key([mod], "w", lazy.window.kill(), desc="Kill focused window"),
@@ -247,36 +922,44 @@ keys = [
     Key(
         [mod],
         "r",
-        lazy.spawn("rofi -show combi -combi-modes 'window,ssh,drun'"),
+        spawn("rofi -show combi -combi-modes 'window,ssh,drun'"),
         desc="App launcher",
     ),
     Key([mod], "period", move_mouse_to_next_monitor(), desc="Focus next screen"),
-    Key([mod, "shift"], "period", move_group_to_next_screen(), desc="Move workspace to next screen"),
     Key(
-        [mod, "shift"], "slash", lazy.group["scratchpad"].dropdown_toggle("help"), desc="Toggle help popup"
+        [mod, "shift"],
+        "period",
+        move_group_to_next_screen(),
+        desc="Move workspace to next screen",
+    ),
+    Key(
+        [mod, "shift"],
+        "slash",
+        lazy.group["scratchpad"].dropdown_toggle("help"),
+        desc="Toggle help popup",
     ),
     Key(
         [mod, "shift"],
         "p",
-        lazy.spawn(os.path.expanduser("~/.config/qtile/install/rofi/screenshot.sh")),
+        spawn(os.path.expanduser("~/.config/qtile/install/rofi/screenshot.sh")),
         desc="Screenshot",
     ),
     Key(
         [mod, "mod1"],
         "l",
-        lazy.spawn("cinnamon-screensaver-command --lock"),
+        spawn("cinnamon-screensaver-command --lock"),
         desc="Lock screen",
     ),
     Key(
         [mod, "shift"],
         "e",
-        lazy.spawn(os.path.expanduser("~/.config/qtile/install/rofi/powermenu.sh")),
+        spawn(os.path.expanduser("~/.config/qtile/install/rofi/powermenu.sh")),
         desc="Power menu",
     ),
     Key(
         [mod, "shift"],
         "m",
-        lazy.spawn(
+        spawn(
             os.path.expanduser(
                 "~/.config/qtile/install/monitor-manager/monitor-menu.sh"
             )
@@ -286,7 +969,7 @@ keys = [
     Key(
         [mod, "shift"],
         "n",
-        lazy.spawn(
+        spawn(
             os.path.expanduser("~/.config/qtile/install/rofi/notification-history.sh")
         ),
         desc="Notification history",
@@ -295,14 +978,14 @@ keys = [
     Key(
         [mod],
         "F1",
-        lazy.spawn("notify-send 'Key Test' 'Mod+F1 pressed - key bindings work'"),
+        spawn("notify-send 'Key Test' 'Mod+F1 pressed - key bindings work'"),
         desc="Test key binding",
     ),
     # Multimedia keys with notifications - try actual detected keys
     Key(
         [],
         "XF86AudioMute",
-        lazy.spawn(
+        spawn(
             'sh -c \'pactl set-sink-mute @DEFAULT_SINK@ toggle; mute_status=$(pactl get-sink-mute @DEFAULT_SINK@ | cut -d" " -f2); if [ "$mute_status" = "yes" ]; then dunstify -a "volume" -u low -r 9991 "🔇 Audio" "Muted"; else volume=$(pactl get-sink-volume @DEFAULT_SINK@ | head -1 | cut -d"/" -f2 | tr -d " %"); dunstify -a "volume" -u low -r 9991 -h int:value:"$volume" "🔊 Audio" "Unmuted - $volume%"; fi\''
         ),
         desc="Toggle mute",
@@ -310,7 +993,7 @@ keys = [
     Key(
         [],
         "XF86AudioLowerVolume",
-        lazy.spawn(
+        spawn(
             'sh -c \'pactl set-sink-mute @DEFAULT_SINK@ 0; current=$(pactl get-sink-volume @DEFAULT_SINK@ | head -1 | cut -d"/" -f2 | tr -d " %"); new=$((current - 5)); [ $new -lt 0 ] && new=0; pactl set-sink-volume @DEFAULT_SINK@ ${new}%; dunstify -a "volume" -u low -r 9991 -h int:value:"$new" "🔉 Volume" "${new}%"\''
         ),
         desc="Lower volume and unmute",
@@ -318,7 +1001,7 @@ keys = [
     Key(
         [],
         "XF86AudioRaiseVolume",
-        lazy.spawn(
+        spawn(
             'sh -c \'pactl set-sink-mute @DEFAULT_SINK@ 0; current=$(pactl get-sink-volume @DEFAULT_SINK@ | head -1 | cut -d"/" -f2 | tr -d " %"); new=$((current + 5)); [ $new -gt 100 ] && new=100; pactl set-sink-volume @DEFAULT_SINK@ ${new}%; dunstify -a "volume" -u low -r 9991 -h int:value:"$new" "🔊 Volume" "${new}%"\''
         ),
         desc="Raise volume and unmute",
@@ -327,7 +1010,7 @@ keys = [
     # Key(
     #     [],
     #     "F20",
-    #     lazy.spawn(
+    #     spawn(
     #         'sh -c \'pactl set-source-mute @DEFAULT_SOURCE@ toggle; mic_status=$(pactl get-source-mute @DEFAULT_SOURCE@ | cut -d" " -f2); if [ "$mic_status" = "yes" ]; then notify-send "🎤 Microphone" "Muted"; else notify-send "🎤 Microphone" "Unmuted"; fi\''
     #     ),
     #     desc="Toggle microphone mute",
@@ -335,9 +1018,30 @@ keys = [
     Key(
         [mod, "shift"],
         "b",
-        lazy.spawn(os.path.expanduser("~/.config/qtile/install/rofi/brightness.sh")),
+        spawn(os.path.expanduser("~/.config/qtile/install/rofi/brightness.sh")),
         desc="Brightness menu",
     ),
+    Key(
+        [], "XF86MonBrightnessUp", change_brightness(5), desc="Raise screen brightness"
+    ),
+    Key(
+        [],
+        "XF86MonBrightnessDown",
+        change_brightness(-5),
+        desc="Lower screen brightness",
+    ),
+    Key(
+        [],
+        "XF86KbdBrightnessUp",
+        change_brightness(keyboard=1),
+        desc="Raise keyboard backlight",
+    ),
+    Key(
+        [],
+        "XF86KbdBrightnessDown",
+        change_brightness(keyboard=-1),
+        desc="Lower keyboard backlight",
+    ),
     Key(
         [],
         "XF86Launch3",
@@ -355,7 +1059,12 @@ keys = [
         desc="Show window switcher",
     ),
     Key([mod], "z", lazy.screen.toggle_group(), desc="Toggle to last used workspace"),
-    Key([mod], "grave", lazy.group["scratchpad"].dropdown_toggle("btop"), desc="Toggle btop"),
+    Key(
+        [mod],
+        "grave",
+        lazy.group["scratchpad"].dropdown_toggle("btop"),
+        desc="Toggle btop",
+    ),
 ]
 
 workspace_configs = [
@@ -431,7 +1140,7 @@ extension_defaults = widget_defaults.copy()
 def amdgpu_metadata():
     """Retrieves the amdgpu metadata"""
     try:
-        output = subprocess.check_output(
+        output = subprocesses.check_output(
             "amdgpu_top -J -d".split(), stderr=subprocess.DEVNULL
         )
         return json.loads(output)
@@ -439,11 +1148,223 @@ def amdgpu_metadata():
         return None
 
 
-def get_vram_usage():
-    data = amdgpu_metadata()
-    if not data:
-        return "GPU: N/A"
+class _NvmlUtilization(ctypes.Structure):
+    _fields_ = [("gpu", ctypes.c_uint), ("memory", ctypes.c_uint)]
+
+
+class _NvmlMemory(ctypes.Structure):
+    _fields_ = [
+        ("total", ctypes.c_ulonglong),
+        ("free", ctypes.c_ulonglong),
+        ("used", ctypes.c_ulonglong),
+    ]
+
+
+class GPUTelemetry:
+    """NVIDIA power, utilisation and VRAM readings without a fork per poll
+
+    NVML is loaded once and the device handles are kept. Without NVML, one
+    long-lived `nvidia-smi --loop-ms` process streams CSV rows and the latest
+    row per GPU is kept.
+
+    Any query wakes a runtime-suspended dGPU. On GPUs with runtime PM enabled,
+    nothing is asked while the PCI `power/runtime_status` isn't "active", and
+    after an idle reading the GPU is left alone for `idle_backoff` seconds so
+    it can suspend. Meanwhile the last readings are returned with no load and
+    no power draw.
+    """
+
+    query = "index,name,power.draw,utilization.gpu,memory.used,memory.total"
+
+    def __init__(self, interval_ms=5000, idle_backoff=60):
+        self.interval_ms = interval_ms
+        self.idle_backoff = idle_backoff
+        self.idle_until = 0.0
+        self.last = []
+        self.devices = [
+            device
+            for device in sorted(Path("/sys/bus/pci/devices").glob("*"))
+            if self._is_nvidia_gpu(device)
+        ]
+        self.handles = []
+        self.nvml = self._load_nvml()
+        self.nvidia_smi = None if self.nvml else shutil.which("nvidia-smi")
+        self.process = None
+        self.started_at = 0.0
+        self.readings = {}  # GPU index -> (timestamp, reading)
+        self.lock = threading.Lock()
+        atexit.register(self.close)
+
+    @property
+    def available(self):
+        return bool(self.handles or self.nvidia_smi)
+
+    @staticmethod
+    def _is_nvidia_gpu(device):
+        try:
+            return (device / "vendor").read_text().strip() == "0x10de" and (
+                device / "class"
+            ).read_text().startswith("0x03")
+        except OSError:
+            return False
+
+    def runtime_pm(self):
+        """Runtime PM status ("active", "suspended", ...) of GPUs with it enabled"""
+        states = []
+        for device in self.devices:
+            try:
+                if (device / "power" / "control").read_text().strip() == "auto":
+                    states.append(
+                        (device / "power" / "runtime_status").read_text().strip()
+                    )
+            except OSError:
+                continue
+        return states
+
+    def _resting(self):
+        """The last readings, or N/A ones, for a GPU that is being left to sleep"""
+        if not self.last:
+            return [
+                {
+                    "name": "GPU",
+                    "power_w": 0.0,
+                    "utilization": 0,
+                    "vram_used_mib": None,
+                    "vram_total_mib": None,
+                }
+                for _ in self.devices
+            ]
+        return [dict(reading, power_w=0.0, utilization=0) for reading in self.last]
+
+    def _load_nvml(self):
+        try:
+            nvml = ctypes.CDLL("libnvidia-ml.so.1")
+            if nvml.nvmlInit_v2() != 0:
+                return None
+        except (OSError, AttributeError):
+            return None
+        count = ctypes.c_uint()
+        if nvml.nvmlDeviceGetCount_v2(ctypes.byref(count)) == 0:
+            for index in range(count.value):
+                handle = ctypes.c_void_p()
+                if nvml.nvmlDeviceGetHandleByIndex_v2(index, ctypes.byref(handle)) == 0:
+                    self.handles.append(handle)
+        return nvml
+
+    def _read_nvml(self, handle):
+        nvml = self.nvml
+        name = ctypes.create_string_buffer(96)
+        power_mw = ctypes.c_uint()
+        utilization = _NvmlUtilization()
+        memory = _NvmlMemory()
+        reading = {
+            "name": "GPU",
+            "power_w": None,
+            "utilization": None,
+            "vram_used_mib": None,
+            "vram_total_mib": None,
+        }
+        if nvml.nvmlDeviceGetName(handle, name, len(name)) == 0:
+            reading["name"] = name.value.decode(errors="replace")
+        if nvml.nvmlDeviceGetPowerUsage(handle, ctypes.byref(power_mw)) == 0:
+            reading["power_w"] = power_mw.value / 1000
+        if nvml.nvmlDeviceGetUtilizationRates(handle, ctypes.byref(utilization)) == 0:
+            reading["utilization"] = utilization.gpu
+        if nvml.nvmlDeviceGetMemoryInfo(handle, ctypes.byref(memory)) == 0:
+            reading["vram_used_mib"] = memory.used // 2**20
+            reading["vram_total_mib"] = memory.total // 2**20
+        return reading
 
+    def _start_stream(self):
+        # Don't respawn a crashing nvidia-smi more than once a minute
+        if time.monotonic() - self.started_at < 60:
+            return
+        self.started_at = time.monotonic()
+        try:
+            self.process = subprocesses.Popen(
+                [
+                    self.nvidia_smi,
+                    f"--query-gpu={self.query}",
+                    "--format=csv,noheader,nounits",
+                    f"--loop-ms={self.interval_ms}",
+                ],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+            )
+        except OSError:
+            self.nvidia_smi = None
+            return
+        threading.Thread(
+            target=self._consume, args=(self.process,), name="nvidia-smi", daemon=True
+        ).start()
+
+    def _consume(self, process):
+        def number(value):
+            try:
+                return float(value)
+            except ValueError:  # "[N/A]" on GPUs that don't report it
+                return None
+
+        for line in process.stdout:
+            fields = [field.strip() for field in line.split(",")]
+            if len(fields) != 6:
+                continue
+            used, total = number(fields[4]), number(fields[5])
+            reading = {
+                "name": fields[1],
+                "power_w": number(fields[2]),
+                "utilization": number(fields[3]),
+                "vram_used_mib": None if used is None else int(used),
+                "vram_total_mib": None if total is None else int(total),
+            }
+            with self.lock:
+                self.readings[fields[0]] = (time.monotonic(), reading)
+        with self.lock:
+            if self.process is process:
+                self.process = None
+
+    def read(self):
+        """Returns one dict per GPU with name, power_w, utilization and vram_*_mib"""
+        if not self.nvml and not self.nvidia_smi:
+            return []
+        states = self.runtime_pm()
+        if states and (time.monotonic() < self.idle_until or "active" not in states):
+            with self.lock:
+                if self.process:
+                    # The stream alone would keep the GPU from suspending
+                    self.process.terminate()
+            return self._resting()
+        if self.nvml:
+            readings = [self._read_nvml(handle) for handle in self.handles]
+        else:
+            with self.lock:
+                if self.process is None:
+                    self._start_stream()
+                # Rows older than a few intervals mean the stream has stalled
+                cutoff = time.monotonic() - 3 * self.interval_ms / 1000
+                readings = [
+                    reading
+                    for seen, reading in self.readings.values()
+                    if seen >= cutoff
+                ]
+        if readings:
+            self.last = readings
+            if states and all(reading["utilization"] == 0 for reading in readings):
+                self.idle_until = time.monotonic() + self.idle_backoff
+        return readings
+
+    def close(self):
+        if self.process:
+            self.process.terminate()
+            self.process = None
+
+
+gpu_telemetry = persistent("gpu_telemetry", GPUTelemetry)
+
+
+def get_vram_usage():
+    data = amdgpu_metadata() or []
     parts = []
     for ix, gpu in enumerate(data):
         name = gpu.get("DeviceName", "GPU")
@@ -459,6 +1380,22 @@ def get_vram_usage():
             parts.append(f"[{name}]: {used}/{total} MiB")
         else:
             parts.append("[GPU]: N/A")
+
+    for index, gpu in enumerate(gpu_telemetry.read()):
+        metrics.update(**{f"nvidia{index}_{key}": value for key, value in gpu.items()})
+        name = (
+            gpu["name"].replace("NVIDIA GeForce", "").replace("Laptop GPU", "").strip()
+        )
+        used, total = gpu["vram_used_mib"], gpu["vram_total_mib"]
+        if total is not None and used is not None:
+            utilization = gpu["utilization"]
+            load = f" {utilization:.0f}%" if utilization is not None else ""
+            parts.append(f"[{name}]: {used}/{total} MiB{load}")
+        else:
+            parts.append(f"[{name}]: N/A")
+
+    if not parts:
+        return "GPU: N/A"
     return "\n".join(parts)
 
 
@@ -472,6 +1409,279 @@ def sep(*, foreground=colors["burgandy"], background=None):
         return widget.TextBox("⋮", foreground=foreground, padding=10)
 
 
+class _RasterImage:
+    """A pre-rasterized image, shaped like libqtile.images.Img for widget.Image"""
+
+    def __init__(self, surface):
+        self.surface = surface
+        self.width = surface.get_width()
+        self.height = surface.get_height()
+        self.pattern = cairocffi.SurfacePattern(surface)
+        self.pattern.set_filter(cairocffi.FILTER_BEST)
+
+
+class ImageCache:
+    """Process-wide cache of bar images rasterized at their target height
+
+    Entries are keyed by path, mtime, size and height, so every screen and
+    every reload shares one surface per asset. Rasterized images are also
+    written to ~/.cache/qtile/images as PNGs, which load much faster than
+    decoding and rasterizing the SVG sources again after a restart.
+    """
+
+    def __init__(self, directory=os.path.expanduser("~/.cache/qtile/images")):
+        self.directory = directory
+        self.images = {}
+
+    def get(self, path, height):
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size, int(height))
+        image = self.images.get(key)
+        if image is None:
+            image = self.images[key] = _RasterImage(self._load(key))
+        return image
+
+    def _load(self, key):
+        path, _, _, height = key
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        cached = os.path.join(self.directory, f"{digest}.png")
+        try:
+            return cairocffi.ImageSurface.create_from_png(cached)
+        except (OSError, MemoryError, cairocffi.CairoError):
+            pass
+        img = Img.from_path(path)
+        img.resize(height=height)
+        # Img decodes at the target size; paint it into a surface the cache owns
+        surface = cairocffi.ImageSurface(
+            cairocffi.FORMAT_ARGB32, math.ceil(img.width), math.ceil(img.height)
+        )
+        context = cairocffi.Context(surface)
+        context.set_source(img.pattern)
+        context.paint()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            partial = f"{cached}.{os.getpid()}"
+            surface.write_to_png(partial)
+            os.replace(partial, cached)
+        except (OSError, cairocffi.CairoError):
+            pass
+        return surface
+
+
+image_cache = persistent("image_cache", ImageCache)
+
+
+class CachedImage(widget.Image):
+    """widget.Image that draws from the shared ImageCache"""
+
+    def _update_image(self):
+        filename = os.path.expanduser(self.filename or "")
+        if not (
+            self.scale
+            and self.bar.horizontal
+            and not self.rotate
+            and os.path.exists(filename)
+        ):
+            # Let widget.Image handle (and warn about) anything unusual
+            return super()._update_image()
+        self.filename = filename
+        self.img = image_cache.get(filename, self.bar.height - self.margin_y * 2)
+
+
+class _StickyTextLayout(TextLayout):
+    """TextLayout that skips the Pango re-layout when text or width don't change"""
+
+    @TextLayout.text.setter
+    def text(self, value):
+        if value != getattr(self, "_last_text", None):
+            self._last_text = value
+            TextLayout.text.fset(self, value)
+
+    @TextLayout.width.setter
+    def width(self, value):
+        if value != self._width:
+            TextLayout.width.fset(self, value)
+
+
+class LayoutCache:
+    """Per-widget LRU caches of text layouts and measured text sizes
+
+    Shaping text with Pango is the expensive part of drawing a bar label, so
+    layouts are kept per (text, width) and sizes per text; font and size are
+    fixed for the widget.
+    """
+
+    def __init__(
+        self,
+        drawer,
+        font,
+        fontsize,
+        fontshadow,
+        markup,
+        wrap=True,
+        max_layouts=64,
+        max_sizes=512,
+    ):
+        self.drawer = drawer
+        self.args = (font, fontsize, fontshadow)
+        self.markup = markup
+        self.wrap = wrap
+        self.max_layouts = max_layouts
+        self.max_sizes = max_sizes
+        self.layouts = OrderedDict()
+        self.sizes = OrderedDict()
+        self.measure = self._new_layout("")
+
+    def _new_layout(self, text):
+        return _StickyTextLayout(
+            self.drawer, text, "ffffff", *self.args, wrap=self.wrap, markup=self.markup
+        )
+
+    def layout(self, text, width):
+        key = (text, width)
+        text_layout = self.layouts.get(key)
+        if text_layout is not None:
+            self.layouts.move_to_end(key)
+            return text_layout
+        text_layout = self._new_layout(text)
+        if width is not None:
+            text_layout.width = width
+        self.layouts[key] = text_layout
+        if len(self.layouts) > self.max_layouts:
+            _, evicted = self.layouts.popitem(last=False)
+            evicted.finalize()
+        return text_layout
+
+    def size(self, text):
+        size = self.sizes.get(text)
+        if size is not None:
+            self.sizes.move_to_end(text)
+            return size
+        self.measure.text = text
+        size = self.sizes[text] = (self.measure.width, self.measure.height)
+        if len(self.sizes) > self.max_sizes:
+            self.sizes.popitem(last=False)
+        return size
+
+    def finalize(self):
+        for text_layout in self.layouts.values():
+            text_layout.finalize()
+        self.layouts.clear()
+        self.measure.finalize()
+
+
+class CachedTaskList(widget.TaskList):
+    """TaskList with cached title layouts and rate-limited title redraws
+
+    A title change only redraws the bar when the part of a title that can be
+    visible changes (at most `max_title_width` worth of the narrowest glyph),
+    and no more than `max_title_redraws` times a second.
+    """
+
+    defaults = [
+        ("max_title_redraws", 4, "Maximum redraws per second caused by title changes"),
+    ]
+
+    def __init__(self, **config):
+        super().__init__(**config)
+        self.add_defaults(CachedTaskList.defaults)
+        self._drawn_state = None
+        self._last_draw = 0.0
+        self._pending_draw = None
+
+    def _configure(self, qtile, bar):
+        super()._configure(qtile, bar)
+        self._own_layout = self.layout
+        self._layouts = LayoutCache(
+            self.drawer,
+            self.font,
+            self.fontsize,
+            self.fontshadow,
+            self.markup,
+            wrap=False,
+        )
+        self._visible_chars = None
+        if self.max_title_width and not self.markup:
+            narrowest = min(self._layouts.size(char)[0] for char in " .il'") or 1
+            self._visible_chars = math.ceil(self.max_title_width / narrowest) + 1
+
+    def setup_hooks(self):
+        super().setup_hooks()
+        hook.unsubscribe.client_name_updated(self.update)
+        hook.subscribe.client_name_updated(self._title_changed)
+
+    def box_width(self, text):
+        return self._layouts.size(text)[0] + 2 * (self.padding_side + self.borderwidth)
+
+    def drawtext(self, text, textcolor, width):
+        self.layout = self._layouts.layout(text, width)
+        self.layout.colour = textcolor
+
+    def _visible_state(self, windows=None):
+        # TaskList.windows drops skip-taskbar windows, which are never drawn
+        state = []
+        for window in self.windows if windows is None else windows:
+            name = self.get_taskname(window)
+            state.append((window.wid, name[: self._visible_chars], window.urgent))
+        return state
+
+    def _title_changed(self, window):
+        # On x11 the filtered list costs a property read per window, so build it once
+        windows = self.windows
+        if window not in windows:
+            return
+        if self._visible_state(windows) == self._drawn_state:
+            return
+        delay = self._last_draw + 1 / self.max_title_redraws - time.monotonic()
+        if delay <= 0:
+            self.bar.draw()
+        elif self._pending_draw is None:
+            self._pending_draw = self.timeout_add(delay, self._deferred_draw)
+
+    def _deferred_draw(self):
+        self._pending_draw = None
+        if self._visible_state() != self._drawn_state:
+            self.bar.draw()
+
+    def draw(self):
+        super().draw()
+        self._drawn_state = self._visible_state()
+        self._last_draw = time.monotonic()
+
+    def finalize(self):
+        hook.unsubscribe.client_name_updated(self._title_changed)
+        self.layout = self._own_layout
+        self._layouts.finalize()
+        super().finalize()
+
+
+class CachedGroupBox(widget.GroupBox):
+    """GroupBox that lays out each group label once instead of on every draw"""
+
+    def _configure(self, qtile, bar):
+        super()._configure(qtile, bar)
+        self._own_layout = self.layout
+        self._layouts = LayoutCache(
+            self.drawer, self.font, self.fontsize, self.fontshadow, self.markup
+        )
+
+    def box_width(self, groups):
+        width = max(
+            self._layouts.size(self.fmt.format(group.label))[0] for group in groups
+        )
+        return width + self.padding_x * 2 + self.borderwidth * 2
+
+    def drawbox(self, offset, text, *args, width=None, **kwargs):
+        # drawbox re-sets text and width, which the sticky layout turns into no-ops
+        self.layout = self._layouts.layout(self.fmt.format(text), width)
+        super().drawbox(offset, text, *args, width=width, **kwargs)
+
+    def finalize(self):
+        self.layout = self._own_layout
+        self._layouts.finalize()
+        super().finalize()
+
+
 def has_battery():
     """Check if the system has a battery"""
     import glob
@@ -482,7 +1692,7 @@ def has_battery():
 def has_asus_keyboard():
     """Check if Asus Keyboard is detected (laptop mode)"""
     try:
-        result = subprocess.run(
+        result = subprocesses.run(
             ["xinput", "list", "--name-only"], capture_output=True, text=True, timeout=5
         )
         return "Asus Keyboard" in result.stdout
@@ -491,7 +1701,7 @@ def has_asus_keyboard():
 
 
 def get_power_draw():
-    """Get estimated total system power consumption for workload monitoring"""
+    """Get estimated total system power consumption, or None when there's no reading"""
     try:
         import glob
         import re
@@ -499,7 +1709,7 @@ def get_power_draw():
         # Method 1: Use UPower energy-rate as base, but interpret correctly
         try:
             # Check AC connection status first
-            ac_result = subprocess.run(
+            ac_result = subprocesses.run(
                 ["upower", "-e"], capture_output=True, text=True, timeout=3
             )
             ac_devices = [
@@ -511,7 +1721,7 @@ def get_power_draw():
 
             for ac_device in ac_devices:
                 if ac_device:
-                    ac_info = subprocess.run(
+                    ac_info = subprocesses.run(
                         ["upower", "-i", ac_device],
                         capture_output=True,
                         text=True,
@@ -522,7 +1732,7 @@ def get_power_draw():
                         break
 
             # Get battery energy rate
-            bat_result = subprocess.run(
+            bat_result = subprocesses.run(
                 ["upower", "-e"], capture_output=True, text=True, timeout=3
             )
             bat_devices = [
@@ -531,7 +1741,7 @@ def get_power_draw():
 
             for device in bat_devices:
                 if device:
-                    bat_info = subprocess.run(
+                    bat_info = subprocesses.run(
                         ["upower", "-i", device],
                         capture_output=True,
                         text=True,
@@ -599,19 +1809,13 @@ def get_power_draw():
 
             # GPU power (major power consumer in NVIDIA-only mode)
             try:
-                nvidia_result = subprocess.run(
-                    [
-                        "nvidia-smi",
-                        "--query-gpu=power.draw",
-                        "--format=csv,noheader,nounits",
-                    ],
-                    capture_output=True,
-                    text=True,
-                    timeout=3,
-                )
-                if nvidia_result.returncode == 0 and nvidia_result.stdout.strip():
-                    gpu_power = float(nvidia_result.stdout.strip())
-                    estimated_power += gpu_power
+                gpu_power = [
+                    gpu["power_w"]
+                    for gpu in gpu_telemetry.read()
+                    if gpu["power_w"] is not None
+                ]
+                if gpu_power:
+                    estimated_power += sum(gpu_power)
                 else:
                     # NVIDIA-only mode active but no power reading
                     estimated_power += 30  # Conservative RTX 3050 Ti estimate
@@ -644,7 +1848,7 @@ def get_power_draw():
 
         # Method 3: PowerTOP integration (if available)
         try:
-            result = subprocess.run(
+            result = subprocesses.run(
                 ["powertop", "--dump", "--quiet", "--time=3"],
                 capture_output=True,
                 text=True,
@@ -659,10 +1863,12 @@ def get_power_draw():
         except Exception:
             pass
 
-        return "⚡N/A"
+        # None keeps the last reading up, marked stale (see DeadlinePollText)
+        return None
 
     except Exception:
-        return "⚡ERR"
+        logger.exception("power draw poll failed")
+        return None
 
 
 class TabletModeToggle:
@@ -677,7 +1883,7 @@ class TabletModeToggle:
     def _find_devices(self):
         """Find keyboard and touchpad device IDs"""
         try:
-            result = subprocess.run(
+            result = subprocesses.run(
                 ["xinput", "list"], capture_output=True, text=True, timeout=5
             )
             for line in result.stdout.splitlines():
@@ -704,17 +1910,19 @@ class TabletModeToggle:
         if self.tablet_mode:
             # Disable keyboard and touchpad
             for kbd_id in self.keyboard_ids:
-                subprocess.run(["xinput", "disable", str(kbd_id)], capture_output=True)
+                subprocesses.run(
+                    ["xinput", "disable", str(kbd_id)], capture_output=True
+                )
             if self.touchpad_id:
-                subprocess.run(
+                subprocesses.run(
                     ["xinput", "disable", str(self.touchpad_id)], capture_output=True
                 )
         else:
             # Enable keyboard and touchpad
             for kbd_id in self.keyboard_ids:
-                subprocess.run(["xinput", "enable", str(kbd_id)], capture_output=True)
+                subprocesses.run(["xinput", "enable", str(kbd_id)], capture_output=True)
             if self.touchpad_id:
-                subprocess.run(
+                subprocesses.run(
                     ["xinput", "enable", str(self.touchpad_id)], capture_output=True
                 )
 
@@ -739,20 +1947,77 @@ def toggle_tablet_mode(qtile):
                     widget.update(tablet_toggle.get_status_text())
 
 
-def get_ip_address():
-    """Get the current IP address from WiFi or Ethernet connection"""
-    import subprocess
-    import re
+class BrightnessIndicator(base._TextBox):
+    """Screen (and keyboard) backlight level from the BrightnessController
 
-    try:
-        # Get IP from active network interfaces (excluding loopback)
-        result = subprocess.run(
-            ["ip", "route", "get", "8.8.8.8"], capture_output=True, text=True, timeout=5
+    Scroll to adjust. sysfs is only re-read every `update_interval` seconds to
+    catch changes made outside qtile.
+    """
+
+    defaults = [
+        (
+            "update_interval",
+            30,
+            "Seconds between checks for changes made outside qtile",
+        ),
+    ]
+
+    def __init__(self, **config):
+        super().__init__("", **config)
+        self.add_defaults(BrightnessIndicator.defaults)
+        self.add_callbacks(
+            {
+                "Button4": lambda: backlight.adjust(backlight.step),
+                "Button5": lambda: backlight.adjust(-backlight.step),
+            }
         )
-        if result.returncode == 0:
-            # Extract IP from output like "8.8.8.8 via 192.168.1.1 dev wlan0 src 192.168.1.100"
-            match = re.search(r"src\s+(\d+\.\d+\.\d+\.\d+)", result.stdout)
-            if match:
+
+    def _configure(self, qtile, bar):
+        super()._configure(qtile, bar)
+        backlight.listeners.add(self)
+        self.refresh()
+
+    def timer_setup(self):
+        self.timeout_add(self.update_interval, self._sync)
+
+    def _sync(self):
+        backlight.sync()
+        self.timeout_add(self.update_interval, self._sync)
+
+    def refresh(self):
+        text = f"☀ {round(backlight.target)}%" if backlight.screen else ""
+        if backlight.keyboard:
+            text += f" ⌨ {backlight.keyboard.raw}/{backlight.keyboard.max}"
+        self.update(text)
+
+    def finalize(self):
+        backlight.listeners.discard(self)
+        super().finalize()
+
+    @expose_command()
+    def set_level(self, level):
+        """Ramp the screen backlight to `level` percent"""
+        backlight.set_level(float(level))
+
+    @expose_command()
+    def set_keyboard(self, level):
+        """Set the keyboard backlight to `level` (0 to max_brightness)"""
+        backlight.set_keyboard(int(level))
+
+
+def get_ip_address():
+    """Get the current IP address from WiFi or Ethernet connection"""
+    import re
+
+    try:
+        # Get IP from active network interfaces (excluding loopback)
+        result = subprocesses.run(
+            ["ip", "route", "get", "8.8.8.8"], capture_output=True, text=True, timeout=5
+        )
+        if result.returncode == 0:
+            # Extract IP from output like "8.8.8.8 via 192.168.1.1 dev wlan0 src 192.168.1.100"
+            match = re.search(r"src\s+(\d+\.\d+\.\d+\.\d+)", result.stdout)
+            if match:
                 ip = match.group(1)
                 # Get interface name
                 dev_match = re.search(r"dev\s+(\w+)", result.stdout)
@@ -765,14 +2030,17 @@ def get_ip_address():
 
 
 def get_ip_ssid_info():
-    """Get IP and SSID information stacked"""
-    import subprocess
+    """Get IP and SSID information stacked, or None when a lookup failed or timed out
+
+    None leaves the last good value up, marked stale, instead of an error text.
+    """
     import re
 
     # Get IP address
     ip_info = "No connection"
+    ip = interface = ""
     try:
-        result = subprocess.run(
+        result = subprocesses.run(
             ["ip", "route", "get", "8.8.8.8"], capture_output=True, text=True, timeout=5
         )
         if result.returncode == 0:
@@ -783,13 +2051,14 @@ def get_ip_ssid_info():
                 interface = dev_match.group(1) if dev_match else "unknown"
                 ip_info = f"{ip} ({interface})"
     except Exception:
-        ip_info = "Error"
+        logger.warning("ip route lookup failed", exc_info=True)
+        return None
 
     # Get SSID
     ssid_info = "No WiFi"
     try:
         # Try nmcli first
-        result = subprocess.run(
+        result = subprocesses.run(
             ["nmcli", "-t", "-f", "active,ssid", "dev", "wifi"],
             capture_output=True,
             text=True,
@@ -804,13 +2073,18 @@ def get_ip_ssid_info():
 
         # Fallback to iwgetid if nmcli didn't work
         if ssid_info == "No WiFi":
-            result = subprocess.run(
+            result = subprocesses.run(
                 ["iwgetid", "-r"], capture_output=True, text=True, timeout=5
             )
             if result.returncode == 0 and result.stdout.strip():
                 ssid_info = result.stdout.strip()
     except Exception:
-        ssid_info = "Error"
+        logger.warning("SSID lookup failed", exc_info=True)
+        return None
+
+    # Share with conky and other scripts (see MetricsPublisher)
+    ssid = "" if ssid_info in ("No WiFi", "No SSID") else ssid_info
+    metrics.update(ip=ip, interface=interface, ssid=ssid)
 
     # Calculate padding for left alignment
     lines = [ip_info, ssid_info]
@@ -832,29 +2106,523 @@ def get_hostname():
         return "Host: Error"
 
 
+class PollExecutor:
+    """Runs bar polls off the event loop without letting them pile up
+
+    A source never has two polls in flight: asking for a poll that is still
+    running joins it instead of starting another. Polls get their own small
+    pool so a hung tool can't starve qtile's default executor.
+    """
+
+    def __init__(self, max_workers=6):
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="poll"
+        )
+        self.in_flight = {}
+
+    def submit(self, source, func, deadline, on_done, on_overrun):
+        """Polls `source`; `on_overrun` fires if it runs past `deadline` seconds"""
+        loop = asyncio.get_running_loop()
+        future = self.in_flight.get(source)
+        if future is None:
+            future = loop.run_in_executor(self.pool, func)
+            self.in_flight[source] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(source, None))
+        timer = loop.call_later(deadline, on_overrun)
+
+        def done(future):
+            timer.cancel()
+            on_done(future)
+
+        future.add_done_callback(done)
+
+
+poll_executor = persistent("poll_executor", PollExecutor)
+
+
+class DeadlinePollText(base._TextBox):
+    """GenPollText that keeps the last good value instead of blanking or piling up
+
+    `func` runs on the poll executor. When it overruns its deadline, raises or
+    returns None, the last good text stays up in `stale_foreground` until a
+    fresh value lands; ticks that arrive while a poll is still running are
+    skipped.
+    """
+
+    defaults = [
+        ("func", None, "Poll function returning the text to show"),
+        ("update_interval", 5, "Seconds between polls"),
+        (
+            "deadline",
+            None,
+            "Seconds a poll may run before the text is marked stale (update_interval)",
+        ),
+        ("stale_foreground", "#666666", "Text colour while the value is stale"),
+        (
+            "metric",
+            None,
+            "Key under which fresh text is also published to the metrics endpoint",
+        ),
+    ]
+
+    def __init__(self, **config):
+        super().__init__("…", **config)
+        self.add_defaults(DeadlinePollText.defaults)
+        self.waiting = False
+        # Widgets polling the same function share a single in-flight poll
+        self.source = f"{self.func.__module__}.{self.func.__qualname__}"
+
+    def timer_setup(self):
+        self.tick()
+
+    def tick(self):
+        self.timeout_add(self.update_interval, self.tick)
+        if self.waiting:
+            return
+        self.waiting = True
+        poll_executor.submit(
+            self.source,
+            self.func,
+            self.deadline or self.update_interval,
+            self._on_done,
+            lambda: self._set_stale(True),
+        )
+
+    def _on_done(self, future):
+        self.waiting = False
+        # exception() raises CancelledError on a cancelled future
+        if future.cancelled():
+            self._set_stale(True)
+            return
+        error = future.exception()
+        if error is not None:
+            logger.warning("%s: %s", self.name, error)
+        result = None if error is not None else future.result()
+        if result is None:
+            self._set_stale(True)
+            return
+        self._set_stale(False)
+        self.update(result)
+        if self.metric:
+            metrics.update(**{self.metric: result})
+
+    def _set_stale(self, stale):
+        if not self.can_draw():
+            return
+        colour = self.stale_foreground if stale else self.foreground
+        if self.layout.colour != colour:
+            self.layout.colour = colour
+            self.draw()
+
+
+class ProcessScanner:
+    """Incremental /proc scanner for the process monitor popup
+
+    Every known pid keeps /proc/<pid>/stat (and /proc/<pid>/io when it is
+    readable) open, so a refresh costs one pread per file. Counters live in
+    flat arrays indexed by a slot number; only pids that appeared since the
+    previous scan are opened and have their name parsed. The fds are only
+    held while a popup is open; `release` closes them all.
+    """
+
+    def __init__(self, max_open_fds=128):
+        self.max_open_fds = max_open_fds
+        self.open_fds = 0
+        self.users = 0
+        self.slots = {}  # pid -> slot
+        self.free_slots = []
+        self.names = []
+        self.start_times = array("Q")
+        self.stat_fds = array("i")
+        self.io_fds = array("i")
+        self.cpu_ticks = array("Q")
+        self.cpu_delta = array("Q")
+        self.rss = array("Q")
+        self.io_bytes = array("Q")
+        self.io_delta = array("Q")
+        self.last_scan = 0.0
+        self.interval = 0.0
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        # Popups on several screens share one scanner
+        self.lock = threading.Lock()
+
+    def _open(self, path):
+        if self.open_fds >= self.max_open_fds:
+            return -1
+        try:
+            fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+        except OSError:
+            return -1
+        self.open_fds += 1
+        return fd
+
+    def _close(self, fd):
+        if fd >= 0:
+            os.close(fd)
+            self.open_fds -= 1
+
+    @staticmethod
+    def _read(fd, path):
+        """Re-reads a kept fd, or opens `path` once when we're over the fd budget"""
+        if fd >= 0:
+            return os.pread(fd, 4096, 0)
+        with open(path, "rb") as f:
+            return f.read(4096)
+
+    def _parse_stat(self, data):
+        # The command name may contain spaces and parens, so split after the last ")"
+        fields = data[data.rindex(b")") + 2 :].split()
+        ticks = int(fields[11]) + int(fields[12])  # utime + stime
+        return ticks, int(fields[19]), int(fields[21]) * self.page_size
+
+    @staticmethod
+    def _parse_io(data):
+        lines = data.split(b"\n")
+        return int(lines[4].split()[1]) + int(
+            lines[5].split()[1]
+        )  # read_bytes + write_bytes
+
+    def _add(self, pid):
+        stat_path = f"/proc/{pid}/stat"
+        stat_fd = self._open(stat_path)
+        try:
+            data = self._read(stat_fd, stat_path)
+            ticks, start_time, rss = self._parse_stat(data)
+        except (OSError, ValueError, IndexError):
+            self._close(stat_fd)
+            return
+        name = data[data.index(b"(") + 1 : data.rindex(b")")].decode(errors="replace")
+
+        io_path = f"/proc/{pid}/io"
+        io_fd = self._open(io_path)
+        try:
+            io_bytes = self._parse_io(self._read(io_fd, io_path))
+        except (OSError, ValueError, IndexError):
+            # Other users' processes are not readable, there's no point retrying
+            self._close(io_fd)
+            io_fd, io_bytes = -2, 0
+
+        row = (start_time, stat_fd, io_fd, ticks, 0, rss, io_bytes, 0)
+        columns = (
+            self.start_times, self.stat_fds, self.io_fds, self.cpu_ticks,
+            self.cpu_delta, self.rss, self.io_bytes, self.io_delta,
+        )
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.names[slot] = name
+            for column, value in zip(columns, row):
+                column[slot] = value
+        else:
+            slot = len(self.names)
+            self.names.append(name)
+            for column, value in zip(columns, row):
+                column.append(value)
+        self.slots[pid] = slot
+
+    def _remove(self, pid):
+        slot = self.slots.pop(pid)
+        self._close(self.stat_fds[slot])
+        self._close(self.io_fds[slot])
+        self.stat_fds[slot] = self.io_fds[slot] = -1
+        self.cpu_delta[slot] = self.io_delta[slot] = 0
+        self.names[slot] = ""
+        self.free_slots.append(slot)
+
+    def _update(self, pid, slot):
+        """Refreshes the counters of a known pid, False if it is gone or was reused"""
+        try:
+            ticks, start_time, rss = self._parse_stat(
+                self._read(self.stat_fds[slot], f"/proc/{pid}/stat")
+            )
+        except (OSError, ValueError, IndexError):
+            return False
+        if start_time != self.start_times[slot]:
+            return False
+        self.cpu_delta[slot] = ticks - self.cpu_ticks[slot]
+        self.cpu_ticks[slot] = ticks
+        self.rss[slot] = rss
+
+        io_fd = self.io_fds[slot]
+        if io_fd != -2:
+            try:
+                io_bytes = self._parse_io(self._read(io_fd, f"/proc/{pid}/io"))
+                self.io_delta[slot] = io_bytes - self.io_bytes[slot]
+                self.io_bytes[slot] = io_bytes
+            except (OSError, ValueError, IndexError):
+                self.io_delta[slot] = 0
+        return True
+
+    def scan(self):
+        """Updates all counters; deltas are relative to the previous scan"""
+        with self.lock:
+            self._scan()
+
+    def _scan(self):
+        now = time.monotonic()
+        seen = set()
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            pid = int(entry)
+            seen.add(pid)
+            slot = self.slots.get(pid)
+            if slot is None:
+                self._add(pid)
+            elif not self._update(pid, slot):
+                self._remove(pid)
+                self._add(pid)
+        for pid in self.slots.keys() - seen:
+            self._remove(pid)
+        self.interval = now - self.last_scan if self.last_scan else 0.0
+        self.last_scan = now
+
+    def release(self):
+        """Closes every kept fd and forgets all pids; the next scan starts afresh"""
+        with self.lock:
+            for pid in list(self.slots):
+                self._remove(pid)
+            self.last_scan = 0.0
+
+    def top(self, count):
+        """Top `count` (pid, name, value) rows by CPU %, RSS MiB and I/O KiB/s"""
+        def ranked(column, scale):
+            best = sorted(
+                self.slots.items(), key=lambda row: column[row[1]], reverse=True
+            )
+            return [
+                (pid, self.names[slot], column[slot] * scale)
+                for pid, slot in best[:count]
+            ]
+
+        with self.lock:
+            interval = self.interval or 1.0
+            return (
+                ranked(self.cpu_delta, 100 / self.clock_ticks / interval),
+                ranked(self.rss, 1 / 2**20),
+                ranked(self.io_delta, 1 / 1024 / interval),
+            )
+
+
+class ProcessMonitor(base._TextBox):
+    """Bar button that toggles a popup with the top processes by CPU, RSS and I/O"""
+
+    defaults = [
+        ("top_count", 8, "Number of processes listed per section"),
+        ("refresh_interval", 2, "Seconds between refreshes while the popup is open"),
+        ("popup_width", 520, "Width of the popup in pixels"),
+        ("popup_font", "JetBrainsMono Nerd Font", "Font used in the popup"),
+        ("popup_fontsize", 13, "Font size used in the popup"),
+        ("popup_background", colors["midnight"], "Popup background colour"),
+        ("popup_foreground", colors["light_blue_grey"], "Popup text colour"),
+        ("popup_border", colors["burgandy"], "Popup border colour"),
+    ]
+
+    def __init__(self, text="📊", **config):
+        super().__init__(text, **config)
+        self.add_defaults(ProcessMonitor.defaults)
+        self.add_callbacks({"Button1": self.toggle})
+        # Shared across screens and reloads so the kept fds are reused
+        self.scanner = persistent("process_scanner", ProcessScanner)
+        self.popup = None
+        self._generation = 0
+
+    def toggle(self):
+        if self.popup:
+            self._close_popup()
+            return
+        screen = self.bar.screen
+        x = min(self.bar.x + self.offsetx, screen.x + screen.width - self.popup_width)
+        self.popup = Popup(
+            self.qtile,
+            x=x,
+            y=self.bar.y + self.bar.height,
+            width=self.popup_width,
+            height=100,
+            font=self.popup_font,
+            fontsize=self.popup_fontsize,
+            foreground=self.popup_foreground,
+            background=self.popup_background,
+            border=self.popup_border,
+            border_width=2,
+            horizontal_padding=10,
+            vertical_padding=8,
+        )
+        self.popup.win.process_button_click = lambda x, y, button: self._close_popup()
+        self.scanner.users += 1
+        self._generation += 1
+        # A stale scan has no meaningful deltas yet, so prime it and refresh shortly
+        primed = time.monotonic() - self.scanner.last_scan < 2 * self.refresh_interval
+        self._refresh(delay=None if primed else 0.25)
+
+    def _refresh(self, delay=None, generation=None):
+        # The chain carries the generation it was started for; reading it here
+        # would let a timer from before a quick close/reopen join the new popup
+        if generation is None:
+            generation = self._generation
+        elif not self.popup or generation != self._generation:
+            return
+        future = self.qtile.run_in_executor(self.scanner.scan)
+
+        def on_done(_):
+            # Stop once the popup is closed, or reopened with its own refresh chain
+            if not self.popup or generation != self._generation:
+                if not self.scanner.users:
+                    # This scan finished after the close and opened fds again
+                    self.scanner.release()
+                return
+            if delay is None:
+                self._render()
+            self.timeout_add(
+                delay or self.refresh_interval, self._refresh, (None, generation)
+            )
+
+        future.add_done_callback(on_done)
+
+    def _render(self):
+        sections = zip(
+            ("CPU %", "RSS MiB", "I/O KiB/s"), self.scanner.top(self.top_count)
+        )
+        lines = []
+        for title, rows in sections:
+            lines.append(f"<b>{title}</b>")
+            for pid, name, value in rows:
+                lines.append(f"{value:>9.1f}  {pid:>7}  {html.escape(name)}")
+        popup = self.popup
+        popup.layout.text = "\n".join(lines)
+        popup.height = popup.layout.height + 2 * popup.vertical_padding
+        if self.bar.screen.bottom is self.bar:
+            popup.y = self.bar.y - popup.height
+        popup.clear()
+        popup.draw_text()
+        popup.place()
+        popup.unhide()
+        popup.draw()
+
+    def _close_popup(self):
+        if self.popup:
+            self.popup.kill()
+            self.popup = None
+            self.scanner.users -= 1
+            # Don't sit on /proc fds while no popup is showing
+            if not self.scanner.users:
+                self.scanner.release()
+
+    def finalize(self):
+        self._close_popup()
+        super().finalize()
+
+
+class DebugStats(base.InLoopPollText):
+    """Config diagnostics, reachable over IPC as `widget debug_stats`
+
+    The bar readout (forks/minute) only shows with QTILE_DEBUG_BAR=1; the
+    commands work either way, e.g.
+
+        qtile cmd-obj -o widget debug_stats -f subprocess_stats
+    """
+
+    defaults = [
+        (
+            "visible",
+            os.environ.get("QTILE_DEBUG_BAR") == "1",
+            "Show the readout in the bar",
+        ),
+    ]
+
+    def __init__(self, **config):
+        super().__init__("", **config)
+        self.add_defaults(DebugStats.defaults)
+
+    def poll(self):
+        if not self.visible:
+            return ""
+        return f"⑂{subprocesses.forks_per_minute()}/min"
+
+    @expose_command()
+    def subprocess_stats(self, top=20):
+        """Subprocesses launched by the config, heaviest total wall time first"""
+        return subprocesses.report(int(top))
+
+    @expose_command()
+    def reset_subprocess_stats(self):
+        """Clears the subprocess accounting"""
+        subprocesses.reset()
+
+    @expose_command()
+    def stalls(self):
+        """Worst and most recent event loop stalls, with the stack that blocked"""
+        return stall_detector.report()
+
+    @expose_command()
+    def set_stall_threshold(self, seconds):
+        """Changes how long the loop may block before it counts as a stall"""
+        stall_detector.threshold = float(seconds)
+
+    @expose_command()
+    def reset_stalls(self):
+        """Clears the recorded stalls"""
+        stall_detector.reset()
+
+    @expose_command()
+    def services(self):
+        """Supervised background services: pid, time-to-ready, restarts and last exit"""
+        return supervisor.status()
+
+    @expose_command()
+    def placements(self):
+        """Saved screen placements per monitor set, and the last restore"""
+        return placements.report()
+
+    @expose_command()
+    def colour_temperature(self):
+        """Current and scheduled colour temperature, and the CRTC gamma sizes"""
+        return colour_temperature.report()
+
+    @expose_command()
+    def set_colour_temperature(self, kelvin=0):
+        """Pin the colour temperature to `kelvin`; 0 returns to the schedule"""
+        colour_temperature.set_override(int(kelvin) or None)
+
+    @expose_command()
+    def binding_latency(self, top=20):
+        """Key and mouse bindings by p99 latency, with p50, max, mean and count"""
+        return binding_latency.report(int(top))
+
+    @expose_command()
+    def reset_binding_latency(self):
+        """Clear the binding latency histograms"""
+        binding_latency.reset()
+
+    @expose_command()
+    def suspend_state(self):
+        """logind inhibitors, cached outputs and recent lid/suspend events"""
+        return suspend_handler.report()
+
+
 def screen(main=False):
     """Returns a default screen with a bar."""
     bottom_widgets = [
-        widget.Image(filename=images["cpu"], margin=8),
+        CachedImage(filename=images["cpu"], margin=8),
         widget.ThermalSensor(
             format="{temp:.1f}{unit}",
             tag_sensor="Tctl",
             sensors_chip="k10temp-pci-00c3",
         ),
         sep(),
-        widget.Image(filename=images["gpu"], margin=5),
+        CachedImage(filename=images["gpu"], margin=5),
         widget.ThermalSensor(
             format="{temp:.1f}{unit}",
             tag_sensor="edge",
             sensors_chip="amdgpu-pci-1800",
         ),
-        widget.GenPollText(func=get_vram_usage, update_interval=3, fontsize=10)
+        DeadlinePollText(func=get_vram_usage, update_interval=3, fontsize=10)
         if main
         else widget.Spacer(length=1),
         sep(),
         widget.CPU(),
         sep(),
-        widget.Image(filename=images["ram"], margin=5),
+        CachedImage(filename=images["ram"], margin=5),
         widget.Memory(),
     ]
 
@@ -863,7 +2631,9 @@ def screen(main=False):
         bottom_widgets.extend(
             [
                 sep(),
-                widget.GenPollText(func=get_power_draw, update_interval=5, fontsize=18),
+                DeadlinePollText(
+                    func=get_power_draw, update_interval=5, fontsize=18, metric="power"
+                ),
             ]
         )
 
@@ -882,6 +2652,15 @@ def screen(main=False):
             ]
         )
 
+    # Add backlight indicator only for main screen on machines with a backlight
+    if main and (backlight.screen or backlight.keyboard):
+        bottom_widgets.extend(
+            [
+                sep(),
+                BrightnessIndicator(name="brightness"),
+            ]
+        )
+
     # Add IP address and hostname widgets only for main screen
     if main:
         bottom_widgets.extend(
@@ -891,7 +2670,7 @@ def screen(main=False):
                     func=get_hostname, update_interval=3600, fontsize=16
                 ),
                 sep(),
-                widget.GenPollText(
+                DeadlinePollText(
                     func=get_ip_ssid_info, update_interval=15, fontsize=10
                 ),
             ]
@@ -900,6 +2679,11 @@ def screen(main=False):
     bottom_widgets.extend(
         [
             widget.Spacer(stretch=True),
+            (
+                DebugStats(name="debug_stats", update_interval=10)
+                if main
+                else widget.Spacer(length=1)
+            ),
             widget.Clock(format="[%Y-%m-%d %H:%M:%S]"),
         ]
     )
@@ -907,15 +2691,15 @@ def screen(main=False):
     bottom = bar.Bar(bottom_widgets, 36, margin=5, background=colors["bar"], opacity=1.0)
     top = bar.Bar(
         [
-            widget.Image(filename=images["linux-mint"], margin=5)
+            CachedImage(filename=images["linux-mint"], margin=5)
             if main
-            else widget.Image(filename=images["python"], margin=5),
+            else CachedImage(filename=images["python"], margin=5),
             sep(),
             widget.TextBox(
                 text="✂️",
                 name="screenshot_button",
                 mouse_callbacks={
-                    "Button1": lazy.spawn(
+                    "Button1": spawn(
                         [
                             "sh",
                             "-c",
@@ -937,17 +2721,19 @@ def screen(main=False):
                 active_color=colors["burgandy"],
                 inactive_color="#666666",
             ),
-            widget.GroupBox(
+            CachedGroupBox(
                 highlight_method="block",
                 disable_drag=True,
                 hide_unused=True,
             ),
             sep(),
-            widget.TaskList(
+            CachedTaskList(
                 stretch=True,
                 highlight_method="block",
                 max_title_width=250,
             ),
+            sep(),
+            ProcessMonitor(name="process_monitor", fontsize=20, padding=8),
             sep() if main and has_asus_keyboard() else widget.Spacer(length=1),
             # Add tablet mode toggle button only on laptop with main screen
             widget.TextBox(
@@ -964,7 +2750,7 @@ def screen(main=False):
             if main
             else widget.Spacer(length=1),
             sep(),
-            widget.Image(filename=images["straw-hat"]),
+            CachedImage(filename=images["straw-hat"]),
         ],
         36,
         margin=5,
@@ -980,7 +2766,7 @@ def screen(main=False):
 def count_monitors():
     """Returns the number of monitors"""
     try:
-        output = subprocess.check_output(["xrandr", "--query"]).decode()
+        output = subprocesses.check_output(["xrandr", "--query"]).decode()
         monitors = [line for line in output.splitlines() if " connected" in line]
         return len(monitors)
     except Exception as e:
@@ -1007,13 +2793,242 @@ mouse = [
     ),
     Click([mod], "Button2", lazy.window.bring_to_front()),
 ]
+
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of microsecond latencies
+
+    Each power of two is split into 2**sub_bits buckets, so a recorded value
+    is off by at most 1/2**sub_bits (about 6%) across 1 µs to ~70 s. Memory is
+    fixed at (max_bits - sub_bits + 1) * 2**sub_bits counters.
+    """
+
+    def __init__(self, sub_bits=4, max_bits=26):
+        self.sub_bits = sub_bits
+        self.max_value = (1 << max_bits) - 1
+        self.counts = array("Q", bytes(8 * ((max_bits - sub_bits + 1) << sub_bits)))
+        self.total = 0
+        self.sum_us = 0
+        self.max_us = 0
+
+    def _index(self, value):
+        shift = max(0, value.bit_length() - 1 - self.sub_bits)
+        return (shift << self.sub_bits) + (value >> shift)
+
+    def _value(self, index):
+        """Midpoint of the range covered by bucket `index`"""
+        shift = max(0, (index >> self.sub_bits) - 1)
+        low = (index - (shift << self.sub_bits)) << shift
+        return low + ((1 << shift) - 1) / 2
+
+    def record(self, us):
+        us = min(max(int(us), 0), self.max_value)
+        self.counts[self._index(us)] += 1
+        self.total += 1
+        self.sum_us += us
+        self.max_us = max(self.max_us, us)
+
+    def percentile(self, q):
+        if not self.total:
+            return 0.0
+        rank = max(1, math.ceil(self.total * q / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self._value(index), self.max_us)
+        return float(self.max_us)
+
+
+class BindingLatency:
+    """Per-binding latency histograms for keys and mouse bindings
+
+    Time runs from qtile dispatching the binding to its last command
+    returning. Async work started by a command (executor jobs, spawned
+    processes) is not included.
+    """
+
+    def __init__(self, max_bindings=512):
+        self.max_bindings = max_bindings
+        self.histograms = {}
+        self.descriptions = {}
+
+    def record(self, binding, ns):
+        histogram = self.histograms.get(binding)
+        if histogram is None:
+            if len(self.histograms) >= self.max_bindings:
+                return
+            histogram = self.histograms[binding] = LatencyHistogram()
+        histogram.record(ns / 1000)
+
+    def report(self, top=20):
+        rows = []
+        for binding, histogram in self.histograms.items():
+            rows.append(
+                {
+                    "binding": binding,
+                    "desc": self.descriptions.get(binding, ""),
+                    "count": histogram.total,
+                    "p50_ms": round(histogram.percentile(50) / 1000, 3),
+                    "p99_ms": round(histogram.percentile(99) / 1000, 3),
+                    "max_ms": round(histogram.max_us / 1000, 3),
+                    "mean_ms": round(histogram.sum_us / histogram.total / 1000, 3),
+                }
+            )
+        rows.sort(key=lambda row: row["p99_ms"], reverse=True)
+        return rows[:top]
+
+    def reset(self):
+        self.histograms.clear()
+
+
+binding_latency = persistent("binding_latency", BindingLatency)
+
+
+class _TracedCall(LazyCall):
+    """Runs a binding's commands as one call and records how long they took"""
+
+    def __init__(self, binding, commands):
+        call = lazy.function(self._run)
+        super().__init__(call._call, call._args, {})
+        self.binding = binding
+        self.commands = commands
+
+    def check(self, q):
+        return any(cmd.check(q) for cmd in self.commands)
+
+    def _run(self, qtile, *extra):
+        # Drags pass the pointer position as extra arguments
+        started = time.perf_counter_ns()
+        for cmd in self.commands:
+            if cmd.check(qtile):
+                status, val = qtile.server.call(
+                    (cmd.selectors, cmd.name, cmd.args + extra, cmd.kwargs, False)
+                )
+                if status in (interface.ERROR, interface.EXCEPTION):
+                    logger.error("%s command error %s: %s", self.binding, cmd.name, val)
+        binding_latency.record(self.binding, time.perf_counter_ns() - started)
+
+
+def trace_bindings(bindings):
+    """Wraps the commands of each Key, Click and Drag in a _TracedCall"""
+    for binding in bindings:
+        if isinstance(binding, Key):
+            name = "+".join([*binding.modifiers, binding.key])
+        else:
+            name = "+".join([*binding.modifiers, binding.button])
+            if isinstance(binding, Drag):
+                name = f"drag {name}"
+        binding_latency.descriptions[name] = getattr(binding, "desc", "")
+        binding.commands = [_TracedCall(name, list(binding.commands))]
+
+
+trace_bindings(keys)
+trace_bindings(mouse)
+
+
+class WindowRuleIndex:
+    """Window rules compiled into dictionary lookups
+
+    Plain Match rules on an exact wm_class, instance, role, window type or
+    title are filed under that value, so a window only fetches each property
+    once and looks it up. Rules using regexes, functions or match combinators
+    are tried one by one. As with a linear scan, the first rule in
+    declaration order that matches wins.
+    """
+
+    # A rule on several properties is filed under the first one it uses here
+    keys = ("wm_class", "wm_instance_class", "role", "wm_type", "title")
+
+    def __init__(self, rules=()):
+        self.buckets = {key: {} for key in self.keys}
+        self.fallback = []
+        self.size = 0
+        for match, value in rules:
+            self.add(match, value)
+
+    def add(self, match, value):
+        order = self.size
+        self.size += 1
+        properties = match._rules if type(match) is Match else {}
+        for key in self.keys:
+            if isinstance(properties.get(key), str):
+                # Single-property rules are settled by the lookup itself
+                entry = (order, match, value, len(properties) == 1)
+                self.buckets[key].setdefault(properties[key], []).append(entry)
+                return
+        self.fallback.append((order, match, value, False))
+
+    @staticmethod
+    def _values(win, key):
+        if key == "wm_class":
+            return set(win.get_wm_class() or ())
+        if key == "wm_instance_class":
+            return (win.get_wm_class() or [None])[:1]
+        if key == "role":
+            return (win.get_wm_role(),)
+        if key == "wm_type":
+            return (win.get_wm_type(),)
+        return (win.name,)
+
+    def lookup(self, win, default=None):
+        candidates = list(self.fallback)
+        for key, bucket in self.buckets.items():
+            if bucket:
+                for value in self._values(win, key):
+                    candidates.extend(bucket.get(value, ()))
+        candidates.sort(key=lambda entry: entry[0])
+        for _, match, value, settled in candidates:
+            if settled or match.compare(win):
+                return value
+        return default
+
+
+class IndexedFloating(layout.Floating):
+    """Floating layout that checks float_rules through a WindowRuleIndex"""
+
+    def __init__(self, float_rules=None, **config):
+        super().__init__(float_rules=float_rules, **config)
+        self.rule_index = WindowRuleIndex((rule, True) for rule in self.float_rules)
+
+    def match(self, win):
+        return self.rule_index.lookup(win, False)
+
+
+class GroupRouter(Rule):
+    """One dgroups rule that sends new windows to their app's group
+
+    DGroups reads `group` right after `matches`, so the looked-up group is
+    stored there.
+    """
+
+    def __init__(self, routes):
+        super().__init__([])
+        self.rule_index = WindowRuleIndex(
+            (Match(wm_class=wm_class), group)
+            for group, wm_classes in routes.items()
+            for wm_class in wm_classes
+        )
+
+    def matches(self, w):
+        self.group = self.rule_index.lookup(w)
+        return self.group is not None
+
+
+# New windows of these apps open on their workspace (see workspace_configs).
+# Matched against either part of WM_CLASS; run `xprop WM_CLASS` to find it.
+app_groups = {
+    "2": ["firefox", "google-chrome", "chromium", "brave-browser"],  # Websites
+    "5": ["Slack", "discord", "Signal", "TelegramDesktop", "Element"],  # Chat
+}
+
 dgroups_key_binder = None
-dgroups_app_rules = []  # type: list
+dgroups_app_rules = [GroupRouter(app_groups)]
 follow_mouse_focus = True
 bring_front_click = False
 floats_kept_above = True
 cursor_warp = False
-floating_layout = layout.Floating(
+floating_layout = IndexedFloating(
     float_rules=[
         # Run the utility of `xprop` to see the wm class and name of an X client.
         *layout.Floating.default_float_rules,
@@ -1028,19 +3043,1061 @@ floating_layout = layout.Floating(
 )
 auto_fullscreen = True
 focus_on_window_activation = "smart"
-reconfigure_screens = True
+# Hotplugs are handled by PlacementSnapshots in one pass instead
+reconfigure_screens = False
 auto_minimize = True
 
 wmname = "LG3D"
 
 
+class PlacementSnapshots:
+    """Remembers where groups and floating windows were for each monitor set
+
+    Snapshots hold the group on each screen, every workspace's layout state
+    and floating window geometry, keyed by a fingerprint of the connected
+    outputs (connector, EDID and CRTC geometry). They are kept in a small JSON
+    file so a dock plugged in after a restart still lands where it was.
+
+    RandR sends several events per hotplug. They are debounced into one
+    reconfigure that assigns the remembered groups to the new screens before
+    anything is laid out, so every group is laid out exactly once.
+    """
+
+    def __init__(
+        self,
+        path=os.path.expanduser("~/.cache/qtile/placements.json"),
+        settle=0.5,
+        max_snapshots=16,
+    ):
+        self.path = path
+        self.settle = settle
+        self.max_snapshots = max_snapshots
+        self.snapshots = OrderedDict()
+        self.current = None
+        self.current_outputs = []
+        self.pending = None
+        self.last_restore = None
+        try:
+            with open(path) as f:
+                self.snapshots.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def outputs():
+        """Connected DRM connectors with a short hash of their EDID"""
+        outputs = []
+        for connector in sorted(Path("/sys/class/drm").glob("card*-*")):
+            try:
+                if (connector / "status").read_text().strip() != "connected":
+                    continue
+                edid = (connector / "edid").read_bytes()
+            except OSError:
+                continue
+            name = connector.name.split("-", 1)[1]
+            outputs.append(f"{name}:{hashlib.sha1(edid).hexdigest()[:8]}")
+        return outputs
+
+    def fingerprint(self, qtile, outputs):
+        rects = sorted(
+            {(s.x, s.y, s.width, s.height) for s in qtile.core.get_screen_info()}
+        )
+        key = repr((outputs, rects)).encode()
+        return hashlib.sha1(key).hexdigest()[:16]
+
+    def capture(self, qtile):
+        """Snapshot the current placement under the current fingerprint"""
+        if self.current is None:
+            return
+        groups = {}
+        for group in qtile.groups:
+            if group.name not in workspace_names:
+                continue
+            floating = [
+                [
+                    win.wid,
+                    win.get_wm_class() or [],
+                    win.float_x,
+                    win.float_y,
+                    win.width,
+                    win.height,
+                ]
+                for win in group.windows
+                if win.floating
+                and not win.fullscreen
+                and not win.maximized
+                and win.float_x is not None
+            ]
+            groups[group.name] = {
+                "layout": group.current_layout,
+                "ratios": [getattr(l, "ratio", None) for l in group.layouts],
+                "floating": floating,
+            }
+        self.snapshots[self.current] = {
+            # By the time a hotplug is seen /sys already lists the new outputs
+            "outputs": self.current_outputs,
+            "screens": [screen.group.name for screen in qtile.screens],
+            "current": qtile.screens.index(qtile.current_screen),
+            "groups": groups,
+        }
+        self.snapshots.move_to_end(self.current)
+        while len(self.snapshots) > self.max_snapshots:
+            self.snapshots.popitem(last=False)
+        self.save()
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            partial = f"{self.path}.{os.getpid()}"
+            with open(partial, "w") as f:
+                json.dump(self.snapshots, f, separators=(",", ":"))
+            os.replace(partial, self.path)
+        except OSError:
+            logger.exception("failed to save window placements")
+
+    def screen_changed(self, qtile, event):
+        # qtile fires screen_change(None) on every config load; only note the setup then
+        if event is None:
+            if self.current is None:
+                self.current_outputs = self.outputs()
+                self.current = self.fingerprint(qtile, self.current_outputs)
+            return
+        if self.pending is None:
+            # Nothing has moved yet, so this is the last chance to record the old setup
+            self.capture(qtile)
+        else:
+            self.pending.cancel()
+        self.pending = asyncio.get_running_loop().call_later(
+            self.settle, self.restore, qtile
+        )
+
+    def restore(self, qtile):
+        self.pending = None
+        outputs = self.outputs()
+        fingerprint = self.fingerprint(qtile, outputs)
+        snapshot = self.snapshots.get(fingerprint)
+        started = time.perf_counter()
+        self.current, self.current_outputs = fingerprint, outputs
+        self.reconfigure(qtile, snapshot or {})
+        self.last_restore = {
+            "fingerprint": fingerprint,
+            "snapshot": snapshot is not None,
+            "screens": len(qtile.screens),
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        logger.info("screens reconfigured: %s", self.last_restore)
+
+    def _assignment(self, qtile, count, wanted):
+        """Picks a workspace for each of `count` screens, preferring `wanted`"""
+        workspaces = [g for g in qtile.groups if g.name in workspace_names]
+        current = [screen.group for screen in qtile.screens]
+        chosen = []
+        for i in range(count):
+            for group in (
+                qtile.groups_map.get(wanted[i]) if i < len(wanted) else None,
+                current[i] if i < len(current) else None,
+                *workspaces,
+            ):
+                if (
+                    group is not None
+                    and group.name in workspace_names
+                    and group not in chosen
+                ):
+                    chosen.append(group)
+                    break
+        return chosen
+
+    def reconfigure(self, qtile, snapshot):
+        """Like Qtile.reconfigure_screens, but groups are placed before laying out"""
+        # Alias screens with the same x and y, taking the largest, like qtile does
+        xywh = {}
+        for info in qtile.core.get_screen_info():
+            width, height = xywh.get((info.x, info.y), (0, 0))
+            xywh[(info.x, info.y)] = (max(width, info.width), max(height, info.height))
+        rects = [(x, y, w, h) for (x, y), (w, h) in xywh.items()]
+        assignment = self._assignment(qtile, len(rects), snapshot.get("screens", []))
+        saved_groups = snapshot.get("groups", {})
+
+        with qtile.core.masked():
+            for group in qtile.groups:
+                if group.screen is not None and group not in assignment:
+                    group.hide()
+
+            screens = []
+            for i, (rect, group) in enumerate(zip(rects, assignment)):
+                scr = (
+                    qtile.config.screens[i]
+                    if i < len(qtile.config.screens)
+                    else Screen()
+                )
+                reconfigure_gaps = rect != (
+                    scr.x,
+                    scr.y,
+                    scr.width,
+                    scr.height,
+                ) or i >= len(qtile.screens)
+                # Pairing them up front turns Screen.set_group into a no-op
+                scr.group = group
+                group.screen = scr
+                scr._configure(
+                    qtile, i, *rect, group, reconfigure_gaps=reconfigure_gaps
+                )
+                screens.append(scr)
+            for scr in qtile.screens:
+                if scr not in screens:
+                    scr.finalize_gaps()
+            qtile.screens = screens
+            current = snapshot.get("current", 0)
+            if snapshot and current < len(screens):
+                qtile.current_screen = screens[current]
+            elif qtile.current_screen not in screens:
+                qtile.current_screen = screens[0]
+
+            for group in qtile.groups:
+                saved = saved_groups.get(group.name)
+                if saved:
+                    self._restore_group(group, saved)
+                if group.screen is None:
+                    continue
+                group.floating_layout.to_screen(group, group.screen)
+                group.layout_all()
+                screen_rect = group.screen.get_rect()
+                group.floating_layout.show(screen_rect)
+                group.layout.show(screen_rect)
+
+        hook.fire("setgroup")
+        hook.fire("screens_reconfigured")
+
+    @staticmethod
+    def _restore_group(group, saved):
+        for group_layout, ratio in zip(group.layouts, saved["ratios"]):
+            if ratio is not None and hasattr(group_layout, "ratio"):
+                group_layout.ratio = ratio
+        # use_layout hides the old layout and fires layout_change for the bar
+        if saved["layout"] != group.current_layout and saved["layout"] < len(
+            group.layouts
+        ):
+            group.use_layout(saved["layout"])
+        windows = {win.wid: win for win in group.windows}
+        for wid, wm_class, float_x, float_y, width, height in saved["floating"]:
+            win = windows.get(wid)
+            # Window ids are reused across restarts; the class has to match too
+            if (
+                win is None
+                or not win.floating
+                or (win.get_wm_class() or []) != wm_class
+            ):
+                continue
+            win.float_x, win.float_y = float_x, float_y
+            win.width, win.height = width, height
+
+    def report(self):
+        return {
+            "current": self.current,
+            "snapshots": {
+                key: {"outputs": s["outputs"], "screens": s["screens"]}
+                for key, s in self.snapshots.items()
+            },
+            "last_restore": self.last_restore,
+        }
+
+
+workspace_names = {key for key, _ in workspace_configs}
+placements = persistent("placements", PlacementSnapshots)
+
+
+@hook.subscribe.screen_change
+def screen_changed(event):
+    placements.screen_changed(libqtile.qtile, event)
+
+
+@hook.subscribe.shutdown
+def save_placements():
+    placements.capture(libqtile.qtile)
+
+
+class ColourTemperature:
+    """Time-of-day colour temperature as RandR gamma ramps on qtile's X connection
+
+    The temperature is interpolated linearly between the points of `schedule`,
+    wrapping at midnight, and re-checked every `interval` seconds. Ramps are
+    built once per (ramp size, temperature) from a shared linear ramp for that
+    size, so a monitor hotplug only resends cached arrays.
+    """
+
+    # (hour, kelvin): the four bands of the old redshift/gamma.sh with hour-long fades
+    schedule = [
+        (5.5, 3500),
+        (6.5, 5000),  # morning
+        (7.5, 5000),
+        (8.5, 6500),  # day, no adjustment
+        (16.5, 6500),
+        (17.5, 4500),  # evening
+        (19.5, 4500),
+        (20.5, 3500),  # night
+    ]
+    neutral = 6500
+
+    def __init__(self, interval=60, resolution=10, max_ramps=64):
+        self.interval = interval
+        self.resolution = resolution
+        self.max_ramps = max_ramps
+        self.linear = {}
+        self.ramps = OrderedDict()
+        self.gamma_sizes = {}
+        self.kelvin = None
+        self.override = None
+        self.timer = None
+
+    def current(self, now=None):
+        now = now or datetime.datetime.now()
+        hour = now.hour + now.minute / 60 + now.second / 3600
+        points = [(self.schedule[-1][0] - 24, self.schedule[-1][1])]
+        points += self.schedule + [(self.schedule[0][0] + 24, self.schedule[0][1])]
+        for (h0, k0), (h1, k1) in zip(points, points[1:]):
+            if h0 <= hour < h1:
+                kelvin = k0 + (k1 - k0) * (hour - h0) / (h1 - h0)
+                return int(round(kelvin / self.resolution) * self.resolution)
+        return self.neutral
+
+    @staticmethod
+    def _blackbody(kelvin):
+        # Tanner Helland's fit of the blackbody colour, 0-255 per channel
+        t = kelvin / 100
+        if t <= 66:
+            red = 255.0
+            green = 99.4708025861 * math.log(t) - 161.1195681661
+        else:
+            red = 329.698727446 * (t - 60) ** -0.1332047592
+            green = 288.1221695283 * (t - 60) ** -0.0755148492
+        if t >= 66:
+            blue = 255.0
+        elif t <= 19:
+            blue = 0.0
+        else:
+            blue = 138.5177312231 * math.log(t - 10) - 305.0447927307
+        return [min(max(c, 0.0), 255.0) for c in (red, green, blue)]
+
+    def whitepoint(self, kelvin):
+        """RGB multipliers for `kelvin`, with the neutral temperature at 1.0"""
+        reference = self._blackbody(self.neutral)
+        return [min(1.0, c / r) for c, r in zip(self._blackbody(kelvin), reference)]
+
+    def ramp(self, size, kelvin):
+        key = (size, kelvin)
+        ramp = self.ramps.get(key)
+        if ramp is not None:
+            self.ramps.move_to_end(key)
+            return ramp
+        linear = self.linear.get(size)
+        if linear is None:
+            linear = self.linear[size] = [i * 65535 / (size - 1) for i in range(size)]
+        ramp = self.ramps[key] = tuple(
+            array("H", [int(v * scale) for v in linear])
+            for scale in self.whitepoint(kelvin)
+        )
+        if len(self.ramps) > self.max_ramps:
+            self.ramps.popitem(last=False)
+        return ramp
+
+    def apply(self, kelvin):
+        core = libqtile.qtile.core
+        if core.name != "x11" or not hasattr(core.conn, "randr"):
+            return
+        randr = core.conn.randr.ext
+        try:
+            # The Current variant doesn't make the server probe outputs
+            crtcs = (
+                randr.GetScreenResourcesCurrent(core.conn.default_screen.root.wid)
+                .reply()
+                .crtcs
+            )
+            cookies = [
+                (crtc, randr.GetCrtcGammaSize(crtc))
+                for crtc in crtcs
+                if crtc not in self.gamma_sizes
+            ]
+            for crtc, cookie in cookies:
+                self.gamma_sizes[crtc] = cookie.reply().size
+            for crtc in crtcs:
+                size = self.gamma_sizes[crtc]
+                if size > 1:
+                    randr.SetCrtcGamma(crtc, size, *self.ramp(size, kelvin))
+            core.conn.conn.flush()
+        except Exception:
+            logger.exception("failed to set gamma ramps")
+            return
+        self.kelvin = kelvin
+        metrics.update(colour_temperature=kelvin)
+
+    def start(self):
+        if self.timer is None:
+            self._tick()
+
+    def _tick(self):
+        kelvin = self.override or self.current()
+        if kelvin != self.kelvin:
+            self.apply(kelvin)
+        self.timer = asyncio.get_running_loop().call_later(self.interval, self._tick)
+
+    def screen_changed(self):
+        # Re-enabled CRTCs come back with an identity ramp, and sizes may differ
+        self.gamma_sizes.clear()
+        self.apply(self.kelvin or self.override or self.current())
+
+    def set_override(self, kelvin):
+        self.override = kelvin
+        self.apply(kelvin or self.current())
+
+    def report(self):
+        return {
+            "kelvin": self.kelvin,
+            "scheduled": self.current(),
+            "override": self.override,
+            "crtcs": dict(self.gamma_sizes),
+            "cached_ramps": len(self.ramps),
+        }
+
+
+colour_temperature = persistent("colour_temperature", ColourTemperature)
+
+
+@hook.subscribe.screen_change
+def reapply_gamma(event):
+    colour_temperature.screen_changed()
+
+
+@hook.subscribe.shutdown
+def reset_gamma():
+    colour_temperature.apply(ColourTemperature.neutral)
+
+
+class SuspendHandler:
+    """Lid close and suspend through logind, replacing monitor-aware-suspend.sh
+
+    qtile holds two logind inhibitors. A block on handle-lid-switch means a
+    lid close is decided here from the cached RandR output list: suspend only
+    when no external monitor is connected. A delay on sleep makes every
+    suspend, whoever starts it, wait until the screensaver reports itself
+    locked, for as long as logind's InhibitDelayMaxUSec allows; the delay is
+    released right after and taken again on resume.
+    Without dbus_fast or a system bus, logind.conf handles the lid as before.
+    """
+
+    login1 = (
+        "org.freedesktop.login1",
+        "/org/freedesktop/login1",
+        "org.freedesktop.login1.Manager",
+    )
+    screensaver = (
+        "org.cinnamon.ScreenSaver",
+        "/org/cinnamon/ScreenSaver",
+        "org.cinnamon.ScreenSaver",
+    )
+    internal_outputs = ("eDP", "LVDS", "DSI")
+
+    def __init__(self, lock_timeout=5.0):
+        # Replaced by logind's InhibitDelayMaxUSec once connected
+        self.lock_timeout = lock_timeout
+        self.system = None
+        self.session = None
+        self.lid_fd = None
+        self.sleep_fd = None
+        self.outputs = []
+        self.lid_closed = False
+        self.task = None
+        self.events = deque(maxlen=32)
+
+    def start(self):
+        if self.task is not None:
+            return
+        if MessageBus is None:
+            logger.warning(
+                "dbus_fast is not installed, lid close is left to logind.conf"
+            )
+            return
+        self.refresh_outputs()
+        self.task = asyncio.ensure_future(self._connect())
+
+    def refresh_outputs(self):
+        """Caches the connected outputs from RandR on qtile's own connection"""
+        core = libqtile.qtile.core
+        if core.name != "x11" or not hasattr(core.conn, "randr"):
+            return
+        randr = core.conn.randr.ext
+        try:
+            resources = randr.GetScreenResourcesCurrent(
+                core.conn.default_screen.root.wid
+            ).reply()
+            # Send every request before waiting on the first reply; 0 is CurrentTime
+            cookies = [randr.GetOutputInfo(output, 0) for output in resources.outputs]
+            infos = [cookie.reply() for cookie in cookies]
+        except Exception:
+            logger.exception("failed to query RandR outputs")
+            return
+        # 0 is xcffib.randr.Connection.Connected
+        self.outputs = [
+            bytes(info.name).decode() for info in infos if info.connection == 0
+        ]
+
+    def external_outputs(self):
+        return [o for o in self.outputs if not o.startswith(self.internal_outputs)]
+
+    def _record(self, event, **details):
+        self.events.append(
+            {
+                "at": datetime.datetime.now().isoformat(timespec="milliseconds"),
+                "event": event,
+                **details,
+            }
+        )
+
+    async def _call(self, bus, target, member, signature="", body=()):
+        destination, path, interface = target
+        reply = await bus.call(
+            Message(
+                destination=destination,
+                path=path,
+                interface=interface,
+                member=member,
+                signature=signature,
+                body=list(body),
+            )
+        )
+        if reply.message_type == MessageType.ERROR:
+            raise RuntimeError(f"{member}: {reply.error_name} {reply.body}")
+        return reply
+
+    async def _inhibit(self, what, why, mode):
+        reply = await self._call(
+            self.system, self.login1, "Inhibit", "ssss", [what, "qtile", why, mode]
+        )
+        return reply.unix_fds[reply.body[0]]
+
+    async def _connect(self):
+        try:
+            self.system = await MessageBus(
+                bus_type=BusType.SYSTEM, negotiate_unix_fd=True
+            ).connect()
+            self.session = await MessageBus().connect()
+            self.system.add_message_handler(self._on_message)
+            bus = (
+                "org.freedesktop.DBus",
+                "/org/freedesktop/DBus",
+                "org.freedesktop.DBus",
+            )
+            for rule in (
+                "type='signal',interface='org.freedesktop.login1.Manager',"
+                "member='PrepareForSleep'",
+                # logind and UPower both publish the lid state; the first one wins
+                "type='signal',interface='org.freedesktop.DBus.Properties',"
+                "path='/org/freedesktop/login1'",
+                "type='signal',interface='org.freedesktop.DBus.Properties',"
+                "path='/org/freedesktop/UPower'",
+            ):
+                await self._call(self.system, bus, "AddMatch", "s", [rule])
+            self.lid_fd = await self._inhibit(
+                "handle-lid-switch",
+                "Suspends on lid close only without external monitors",
+                "block",
+            )
+            self.sleep_fd = await self._inhibit(
+                "sleep", "Locks the screen before suspend", "delay"
+            )
+        except Exception:
+            logger.exception(
+                "logind integration unavailable, lid close is left to logind.conf"
+            )
+            return
+        try:
+            properties = (
+                "org.freedesktop.login1",
+                "/org/freedesktop/login1",
+                "org.freedesktop.DBus.Properties",
+            )
+            reply = await self._call(
+                self.system,
+                properties,
+                "Get",
+                "ss",
+                ["org.freedesktop.login1.Manager", "InhibitDelayMaxUSec"],
+            )
+            # Leave a little of logind's limit to release the inhibitor ourselves
+            self.lock_timeout = max(reply.body[0].value / 1e6 - 0.2, 0.5)
+        except Exception:
+            logger.warning(
+                "couldn't read InhibitDelayMaxUSec, waiting %ss for the lock",
+                self.lock_timeout,
+            )
+
+    def _on_message(self, message):
+        if message.message_type != MessageType.SIGNAL:
+            return
+        if message.member == "PrepareForSleep":
+            if message.body[0]:
+                asyncio.ensure_future(self._before_sleep())
+            else:
+                asyncio.ensure_future(self._after_resume())
+        elif message.member == "PropertiesChanged":
+            changed = message.body[1]
+            for name in ("LidClosed", "LidIsClosed"):
+                if name in changed:
+                    self._lid_changed(bool(changed[name].value))
+
+    def _lid_changed(self, closed):
+        if closed == self.lid_closed:
+            return
+        self.lid_closed = closed
+        if not closed:
+            return
+        external = self.external_outputs()
+        self._record("lid closed", external=external)
+        if external:
+            subprocesses.Popen(
+                [
+                    "notify-send",
+                    "Suspend Prevented",
+                    "External monitor connected - lid close ignored",
+                    "-u",
+                    "normal",
+                ]
+            )
+        else:
+            asyncio.ensure_future(self._suspend())
+
+    async def _suspend(self):
+        try:
+            await self._call(self.system, self.login1, "Suspend", "b", [False])
+        except Exception:
+            logger.exception("suspend request failed")
+
+    async def _lock(self):
+        try:
+            await self._call(self.session, self.screensaver, "Lock", "s", [""])
+        except Exception:
+            subprocesses.Popen(["cinnamon-screensaver-command", "--lock"])
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            try:
+                reply = await self._call(self.session, self.screensaver, "GetActive")
+                if reply.body[0]:
+                    return True
+            except Exception:
+                pass
+            await asyncio.sleep(0.05)
+        return False
+
+    async def _before_sleep(self):
+        started = time.monotonic()
+        locked = False
+        try:
+            locked = await self._lock()
+        except Exception:
+            logger.exception("failed to lock before suspend")
+        finally:
+            # logind suspends as soon as the last delay inhibitor is gone
+            if self.sleep_fd is not None:
+                os.close(self.sleep_fd)
+                self.sleep_fd = None
+        self._record(
+            "suspending",
+            locked=locked,
+            lock_ms=round((time.monotonic() - started) * 1000),
+        )
+        if not locked:
+            logger.error(
+                "screen lock not confirmed within %ss, suspending unlocked",
+                self.lock_timeout,
+            )
+            # Shown on resume, so the unlocked wake-up doesn't go unnoticed
+            subprocesses.Popen(
+                [
+                    "notify-send",
+                    "Suspended Unlocked",
+                    "The screen didn't lock before suspend",
+                    "-u",
+                    "critical",
+                ]
+            )
+
+    async def _after_resume(self):
+        self._record("resumed")
+        if self.sleep_fd is None and self.system is not None:
+            try:
+                self.sleep_fd = await self._inhibit(
+                    "sleep", "Locks the screen before suspend", "delay"
+                )
+            except Exception:
+                logger.exception("failed to take the sleep inhibitor again")
+
+    def report(self):
+        return {
+            "connected": self.system is not None,
+            "lid_inhibitor": self.lid_fd is not None,
+            "sleep_inhibitor": self.sleep_fd is not None,
+            "outputs": self.outputs,
+            "lid_closed": self.lid_closed,
+            "events": list(self.events),
+        }
+
+
+suspend_handler = persistent("suspend_handler", SuspendHandler)
+
+
+@hook.subscribe.screen_change
+def cache_outputs(event):
+    suspend_handler.refresh_outputs()
+
+
+def default_interface():
+    """Returns the interface of the default route, read from /proc/net/route"""
+    try:
+        with open("/proc/net/route") as f:
+            for line in f.readlines()[1:]:
+                fields = line.split()
+                if fields[1] == "00000000":
+                    return fields[0]
+    except (OSError, IndexError):
+        pass
+    return ""
+
+
+class Service:
+    """A background daemon or one-shot command started by the ServiceSupervisor
+
+    Running instances are recognised by `comm` (like `pgrep -x`), or by the
+    `cmdline` regex (like `pgrep -f`) for scripts and shared binaries.
+    """
+
+    def __init__(
+        self,
+        name,
+        argv,
+        *,
+        comm=None,
+        cmdline=None,
+        oneshot=False,
+        env=None,
+        log_tag=None,
+    ):
+        self.name = name
+        self.argv = argv
+        if comm is None and not cmdline:
+            comm = os.path.basename(argv[0])[:15]  # the kernel truncates comm
+        self.comm = comm
+        self.cmdline = re.compile(cmdline) if cmdline else None
+        self.oneshot = oneshot
+        self.env = env or {}
+        self.log_tag = log_tag
+        self.pid = None
+        self.adopted = False
+        self.started_at = None
+        self.ready_s = None
+        self.restarts = 0
+        self.backoff = 1.0
+        self.last_exit = None
+
+    def matches(self, comm, cmdline):
+        if self.cmdline:
+            return bool(self.cmdline.search(cmdline()))
+        return comm == self.comm
+
+    def status(self):
+        return {
+            "name": self.name,
+            "pid": self.pid,
+            "adopted": self.adopted,
+            "ready_s": self.ready_s,
+            "restarts": self.restarts,
+            "last_exit": self.last_exit,
+        }
+
+
+class ServiceSupervisor:
+    """Starts the session's background services in parallel and keeps them running
+
+    Daemons that are already running are adopted from a single /proc scan
+    instead of a pgrep per service. Every pid is watched through a pidfd on
+    the event loop; a daemon that dies is restarted with exponential backoff,
+    which resets once it has stayed up for `stable_after` seconds.
+    """
+
+    def __init__(self, stable_after=60, max_backoff=60, ready_timeout=10):
+        self.stable_after = stable_after
+        self.max_backoff = max_backoff
+        self.ready_timeout = ready_timeout
+        self.services = {}
+        self.stopping = False
+        self.loop = None
+
+    def start(self, services):
+        """Launches `services` in the background and returns immediately"""
+        self.loop = asyncio.get_running_loop()
+        for service in services:
+            self.services[service.name] = service
+        return asyncio.ensure_future(self._start_all(services))
+
+    async def _start_all(self, services):
+        running = await self.loop.run_in_executor(None, self._running_processes)
+        await asyncio.gather(*(self._start(service, running) for service in services))
+
+    @staticmethod
+    def _running_processes():
+        """(pid, comm, cmdline loader) for every process, read once from /proc"""
+        processes = []
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/comm") as f:
+                    comm = f.read().strip()
+            except OSError:
+                continue
+
+            def cmdline(pid=entry):
+                try:
+                    with open(f"/proc/{pid}/cmdline", "rb") as f:
+                        return (
+                            f.read()
+                            .replace(b"\0", b" ")
+                            .decode(errors="replace")
+                            .strip()
+                        )
+                except OSError:
+                    return ""
+
+            processes.append((int(entry), comm, cmdline))
+        return processes
+
+    async def _start(self, service, running):
+        if not service.oneshot:
+            for pid, comm, cmdline in running:
+                if pid != os.getpid() and service.matches(comm, cmdline):
+                    service.pid, service.adopted = pid, True
+                    service.started_at = time.monotonic()
+                    self._watch(service, pid)
+                    return
+        await self._launch(service)
+
+    async def _launch(self, service):
+        if self.stopping:
+            return
+        env = os.environ.copy()
+        env.pop("VIRTUAL_ENV", None)
+        env.update(service.env)
+        service.started_at = time.monotonic()
+        try:
+            process = await self.loop.run_in_executor(None, self._popen, service, env)
+        except OSError as e:
+            logger.warning("service %s failed to start: %s", service.name, e)
+            service.last_exit = str(e)
+            return
+        subprocesses.record("ServiceSupervisor", service.argv)
+        service.pid, service.adopted = process.pid, False
+        self._watch(service, process.pid)
+        await self._wait_ready(service, process.pid)
+
+    @staticmethod
+    def _popen(service, env):
+        output = subprocess.DEVNULL
+        log = None
+        if service.log_tag:
+            log = subprocess.Popen(
+                ["logger", "-t", service.log_tag],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+            output = log.stdin
+        try:
+            return subprocess.Popen(
+                service.argv,
+                stdin=subprocess.DEVNULL,
+                stdout=output,
+                stderr=output,
+                env=env,
+                start_new_session=True,
+            )
+        finally:
+            if log:
+                log.stdin.close()
+
+    async def _wait_ready(self, service, pid):
+        """Records time-to-ready: a one-shot's exit or a daemon first idling in S"""
+        deadline = service.started_at + self.ready_timeout
+        while time.monotonic() < deadline and service.pid == pid:
+            if not service.oneshot:
+                try:
+                    with open(f"/proc/{pid}/stat", "rb") as f:
+                        state = f.read().rsplit(b")", 1)[1].split()[0]
+                except (OSError, IndexError):
+                    return
+                if state == b"S":
+                    service.ready_s = round(time.monotonic() - service.started_at, 3)
+                    return
+            await asyncio.sleep(0.05)
+
+    def _watch(self, service, pid):
+        try:
+            pidfd = os.pidfd_open(pid)
+        except (AttributeError, OSError):
+            # The process is already gone, or the kernel has no pidfd support
+            if not os.path.exists(f"/proc/{pid}"):
+                self._exited(service, pid)
+            return
+
+        def on_exit():
+            self.loop.remove_reader(pidfd)
+            os.close(pidfd)
+            self._exited(service, pid)
+
+        self.loop.add_reader(pidfd, on_exit)
+
+    def _exited(self, service, pid):
+        status = None
+        if not service.adopted:
+            try:
+                # qtile's SIGCHLD handler may have reaped it already
+                _, status = os.waitpid(pid, os.WNOHANG)
+                status = os.waitstatus_to_exitcode(status)
+            except ChildProcessError:
+                pass
+        service.last_exit = status
+        if service.pid == pid:
+            service.pid = None
+        if service.oneshot:
+            if service.ready_s is None:
+                service.ready_s = round(time.monotonic() - service.started_at, 3)
+            return
+        if self.stopping:
+            return
+        if time.monotonic() - service.started_at >= self.stable_after:
+            service.backoff = 1.0
+        delay = service.backoff
+        service.backoff = min(service.backoff * 2, self.max_backoff)
+        service.restarts += 1
+        logger.warning(
+            "service %s exited (%s), restarting in %.0fs", service.name, status, delay
+        )
+        self.loop.call_later(
+            delay, lambda: asyncio.ensure_future(self._launch(service))
+        )
+
+    def status(self):
+        return [service.status() for service in self.services.values()]
+
+
+supervisor = persistent("service_supervisor", ServiceSupervisor)
+
+
+def session_services():
+    """Background services started once per session (formerly autostart.sh)"""
+    services = [
+        Service(
+            "picom",
+            [
+                "picom",
+                "--config",
+                os.path.expanduser("~/.config/picom.conf"),
+                "--no-use-damage",
+            ],
+        ),
+        Service("nm-applet", ["nm-applet"]),
+        Service("pasystray", ["pasystray"]),
+        Service("dunst", ["dunst"]),
+        Service("copyq", ["copyq"]),
+        Service("blueman-applet", ["blueman-applet"]),
+        # enable touchpad gestures (works with USB trackpads too)
+        Service("touchegg", ["touchegg"], cmdline=r"touchegg$"),
+        Service(
+            "conky",
+            ["conky"],
+            env={"ACTIVE_INTERFACE": default_interface()},
+            log_tag="conky",
+        ),
+        Service(
+            "monitor-manager",
+            [
+                os.path.expanduser(
+                    "~/.config/qtile/install/monitor-manager/monitor-manager.sh"
+                )
+            ],
+            cmdline=r"monitor-manager\.sh",
+        ),
+        Service(
+            "setxkbmap",
+            ["setxkbmap", "-option", "caps:escape", "-option", "shift:both_capslock"],
+            oneshot=True,
+        ),
+        Service("key-repeat", ["xset", "r", "rate", "200", "35"], oneshot=True),
+        # Let the laptop panel sleep while the machine keeps running (tent mode):
+        # blank after 5 min, DPMS standby after 5 min, suspend after 10, off after 15.
+        Service("screensaver", ["xset", "s", "blank"], oneshot=True),
+        Service("screensaver-timeout", ["xset", "s", "300", "300"], oneshot=True),
+        Service("dpms", ["xset", "+dpms"], oneshot=True),
+        Service("dpms-timeouts", ["xset", "dpms", "300", "600", "900"], oneshot=True),
+    ]
+    if has_battery():
+        services += [
+            # SuspendHandler locks before suspend now; the old units would lock twice
+            Service(
+                "suspend-lock",
+                [
+                    "systemctl",
+                    "--user",
+                    "disable",
+                    "lock-on-suspend.service",
+                    "unlock-on-resume.service",
+                ],
+                oneshot=True,
+            ),
+            # setup via install/auto-rotate/setup.sh
+            Service(
+                "auto-rotate",
+                ["systemctl", "--user", "start", "auto-rotate.service"],
+                oneshot=True,
+            ),
+        ]
+    services.append(
+        Service(
+            "notify-loaded",
+            ["notify-send", "Qtile", "Config loaded successfully.", "-u", "low"],
+            oneshot=True,
+        )
+    )
+    return services
+
+
+@hook.subscribe.shutdown
+def stop_supervising():
+    """Don't restart services that die while the session is going down"""
+    supervisor.stopping = True
+
+
 @hook.subscribe.startup_once
 def startup_once():
     """Starts the first time qtile starts, don't start this on every reload since some of the services shouldn't reload"""
-    subprocess.call(os.path.expanduser("~/.config/qtile/autostart.sh"))
+    os.makedirs(os.path.expanduser("~/Pictures/screenshots"), exist_ok=True)
+    supervisor.start(session_services())
 
 
 @hook.subscribe.startup
 def startup_always():
     """Runs every time qtile is started/reloaded"""
-    subprocess.call(os.path.expanduser("~/.config/qtile/reload.sh"))
+    if os.environ.get("QTILE_DEBUG_BAR") == "1":
+        stall_detector.start(asyncio.get_running_loop())
+    metrics.start(asyncio.get_running_loop())
+    batch_commands.start(asyncio.get_running_loop())
+    colour_temperature.start()
+    if has_battery():
+        suspend_handler.start()
+    supervisor.start(
+        [
+            Service(
+                "reload",
+                [os.path.expanduser("~/.config/qtile/reload.sh")],
+                oneshot=True,
+            )
+        ]
+    )
@@ -1,10 +1,39 @@
 #!/bin/bash
 
-# Get the active network interface
-INTERFACE=$(ip route | awk '/default/ {print $5}')
+# qtile publishes the current IP in a snapshot file (see MetricsPublisher in
+# config.py). Read it with bash builtins and only ask the system when qtile
+# isn't running.
+SNAPSHOT="${XDG_RUNTIME_DIR:-/tmp/qtile-$UID}/qtile/metrics.snapshot"
 
-# Get the IP address
-IP_ADDRESS=$(ip -4 addr show $INTERFACE | grep -oP '(?<=inet\s)\d+(\.\d+){3}')
+snapshot_ip() {
+    local attempt line seq end ip
+    [ -r "$SNAPSHOT" ] || return 1
+    for attempt in 1 2 3; do
+        seq="" end="" ip=""
+        mapfile -t lines < "$SNAPSHOT"
+        for line in "${lines[@]}"; do
+            case "$line" in
+                seq=*) seq="${line#seq=}" ;;
+                ip=*) ip="${line#ip=}" ;;
+                end=*) end="${line#end=}"; break ;;
+            esac
+        done
+        # Matching, even sequence numbers mean no write was in progress
+        if [ -n "$seq" ] && [ "$seq" = "$end" ] && [ $((10#$seq % 2)) -eq 0 ]; then
+            [ -n "$ip" ] && IP_ADDRESS="$ip"
+            return
+        fi
+    done
+    return 1
+}
+
+if ! snapshot_ip || [ -z "$IP_ADDRESS" ]; then
+    # Get the active network interface
+    INTERFACE=$(ip route | awk '/default/ {print $5}')
+
+    # Get the IP address
+    IP_ADDRESS=$(ip -4 addr show $INTERFACE | grep -oP '(?<=inet\s)\d+(\.\d+){3}')
+fi
 
 # Display the information
 echo "IP: $IP_ADDRESS"
@@ -5,6 +5,7 @@
 
 LOG_FILE="$HOME/.cache/qtile-monitor-manager.log"
 TOUCHSCREEN_SCRIPT="$HOME/.config/qtile/install/map-touchscreen-to-laptop.sh"
+QTILE_BATCH="$HOME/.config/qtile/install/qtile-batch.sh"
 
 log() {
     echo "$(date '+%Y-%m-%d %H:%M:%S') - $1" >> "$LOG_FILE"
@@ -51,7 +52,7 @@ show_monitor_menu() {
         "🖥️ Auto Configure (autorandr -c)")
             log "User selected: Auto configure"
             autorandr -c
-            qtile cmd-obj -o cmd -f reload_config
+            "$QTILE_BATCH" "-o cmd -f reload_config"
             dunstify -i display "Monitor Manager" "Applied auto configuration and reloaded qtile"
             # Fix touchscreen mapping after display configuration
             fix_touchscreen_mapping
@@ -89,7 +90,7 @@ show_monitor_menu() {
                 selected_profile=$(echo "$profiles" | rofi -dmenu -p "Select profile:")
                 if [[ -n "$selected_profile" ]]; then
                     autorandr --load "$selected_profile"
-                    qtile cmd-obj -o cmd -f reload_config
+                    "$QTILE_BATCH" "-o cmd -f reload_config"
                     dunstify -i display "Profile Loaded" "Applied: $selected_profile and reloaded qtile"
                     log "Loaded profile: $selected_profile"
                     # Fix touchscreen mapping after profile load
@@ -0,0 +1,41 @@
+#!/bin/bash
+
+# Runs qtile commands as one batch through the config's command socket
+# (BatchCommandServer in config.py), without starting a Python interpreter.
+#
+# Each argument, or each stdin line when there are none, is one command in
+# `qtile cmd-obj` syntax:
+#   qtile-batch.sh "-o group 3 -f toscreen" "-o widget brightness -f set_level -a 50"
+#
+# Prints a JSON list with one result per command and exits 1 if any failed.
+# Falls back to one `qtile cmd-obj` per command when the socket isn't there
+# or can't be connected to.
+SOCK="${XDG_RUNTIME_DIR:-/tmp/qtile-$UID}/qtile/commands.sock"
+
+if [ $# -gt 0 ]; then
+    commands=$(printf '%s\n' "$@")
+else
+    commands=$(cat)
+fi
+
+if [ -S "$SOCK" ] && command -v nc >/dev/null; then
+    # -N: send EOF after the commands so qtile runs the batch and replies
+    # A failed connect falls through to cmd-obj. Once the commands are sent,
+    # re-running them could repeat the ones that already ran, so don't.
+    if reply=$(printf '%s\n' "$commands" | nc -NU "$SOCK" 2>/dev/null); then
+        if [ -z "$reply" ]; then
+            echo "qtile-batch: no reply from $SOCK" >&2
+            exit 1
+        fi
+        echo "$reply"
+        [[ "$reply" != *'"ok": false'* ]]
+        exit
+    fi
+fi
+
+status=0
+while IFS= read -r line; do
+    [ -z "$line" ] && continue
+    eval "qtile cmd-obj $line" || status=1
+done <<< "$commands"
+exit $status
@@ -1,5 +1,17 @@
 #!/bin/bash
 # Interactive brightness menu using rofi
+# Levels are set through qtile's brightness widget so changes ramp smoothly
+# and the bar indicator stays in sync.
+
+QTILE_BATCH="$HOME/.config/qtile/install/qtile-batch.sh"
+
+set_screen() {
+    "$QTILE_BATCH" "-o widget brightness -f set_level -a $1"
+}
+
+set_keyboard() {
+    "$QTILE_BATCH" "-o widget brightness -f set_keyboard -a $1"
+}
 
 # Screen brightness options
 screen_10="☀ Screen 10%"
@@ -22,31 +34,31 @@ chosen=$(echo -e "$screen_10\n$screen_25\n$screen_50\n$screen_75\n$screen_100\n$
 # Execute based on choice
 case $chosen in
     "$screen_10")
-        brightnessctl set 10%
+        set_screen 10
         ;;
     "$screen_25")
-        brightnessctl set 25%
+        set_screen 25
         ;;
     "$screen_50")
-        brightnessctl set 50%
+        set_screen 50
         ;;
     "$screen_75")
-        brightnessctl set 75%
+        set_screen 75
         ;;
     "$screen_100")
-        brightnessctl set 100%
+        set_screen 100
         ;;
     "$kbd_0")
-        brightnessctl -d 'asus::kbd_backlight' set 0
+        set_keyboard 0
         ;;
     "$kbd_1")
-        brightnessctl -d 'asus::kbd_backlight' set 1
+        set_keyboard 1
         ;;
     "$kbd_2")
-        brightnessctl -d 'asus::kbd_backlight' set 2
+        set_keyboard 2
         ;;
     "$kbd_3")
-        brightnessctl -d 'asus::kbd_backlight' set 3
+        set_keyboard 3
         ;;
     "$cancel")
         exit 0
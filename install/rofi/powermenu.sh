@@ -21,7 +21,7 @@ case $chosen in
         systemctl reboot
         ;;
     "$logout")
-        qtile cmd-obj -o cmd -f shutdown
+        ~/.config/qtile/install/qtile-batch.sh "-o cmd -f shutdown"
         ;;
     "$lock")
         cinnamon-screensaver-command --lock